@@ -0,0 +1,154 @@
+"""Generators for synthetic MeteoAlarm Atom feeds, CAP documents and geocodes."""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+LANGUAGES = ['en-GB', 'de-DE', 'fr-FR', 'it-IT', 'et-ET', 'da-DK', 'pl-PL', 'es-ES']
+EVENTS = {
+    '1; Wind': 'Strong wind',
+    '2; snow-ice': 'Snow and ice',
+    '3; Thunderstorm': 'Thunderstorms',
+    '4; Fog': 'Fog',
+    '5; high-temperature': 'High temperature',
+    '10; Rain': 'Heavy rain',
+}
+LEVELS = [('2; yellow; Moderate', 'Moderate'), ('3; orange; Severe', 'Severe'), ('4; red; Extreme', 'Extreme')]
+WORDS = ('gusts reaching up to kilometres per hour expected in exposed coastal and mountain areas with '
+         'possible disruption to travel power supply outdoor activities falling trees and local flooding').split()
+
+
+def emma_id(country: str, index: int) -> str:
+    return f"{country[:2].upper()}{index:03d}"
+
+
+def make_cap(rng: random.Random, country: str, identifier: str, area_code: str,
+             languages: int = 2, polygon_points: int = 0) -> str:
+    """Return a CAP 1.2 document with one <info> block per language."""
+    onset = datetime(2025, 2, 4, tzinfo=timezone.utc) + timedelta(hours=rng.randint(0, 72))
+    expires = onset + timedelta(hours=rng.randint(6, 48))
+    awareness_type, event = rng.choice(list(EVENTS.items()))
+    awareness_level, severity = rng.choice(LEVELS)
+
+    polygon = ''
+    if polygon_points:
+        lat, lon = rng.uniform(36, 70), rng.uniform(-10, 30)
+        points = [(lat + rng.uniform(-0.5, 0.5), lon + rng.uniform(-0.5, 0.5)) for _ in range(polygon_points - 1)]
+        points.append(points[0])
+        polygon = '<polygon>' + ' '.join(f"{p[0]:.4f},{p[1]:.4f}" for p in points) + '</polygon>'
+
+    infos = []
+    for language in LANGUAGES[:languages]:
+        description = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 60)))
+        infos.append(f"""
+    <info>
+        <language>{language}</language>
+        <category>Met</category>
+        <event>{escape(event)} ({language})</event>
+        <responseType>Monitor</responseType>
+        <urgency>Future</urgency>
+        <severity>{severity}</severity>
+        <certainty>Likely</certainty>
+        <effective>{onset.isoformat()}</effective>
+        <onset>{onset.isoformat()}</onset>
+        <expires>{expires.isoformat()}</expires>
+        <senderName>National Weather Service of {country.title()}</senderName>
+        <headline>{severity} {escape(event.lower())} warning ({language})</headline>
+        <description>{escape(description)}</description>
+        <web>https://www.meteoalarm.org</web>
+        <contact>https://www.meteoalarm.org</contact>
+        <parameter>
+            <valueName>awareness_level</valueName>
+            <value>{awareness_level}</value>
+        </parameter>
+        <parameter>
+            <valueName>awareness_type</valueName>
+            <value>{awareness_type}</value>
+        </parameter>
+        <area>
+            <areaDesc>Area {area_code}</areaDesc>
+            {polygon}
+            <geocode>
+                <valueName>EMMA_ID</valueName>
+                <value>{area_code}</value>
+            </geocode>
+        </area>
+    </info>""")
+
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<alert xmlns="urn:oasis:names:tc:emergency:cap:1.2">
+    <identifier>{identifier}</identifier>
+    <sender>noreply@meteoalarm.org</sender>
+    <sent>{onset.isoformat()}</sent>
+    <status>Actual</status>
+    <msgType>Alert</msgType>
+    <scope>Public</scope>{''.join(infos)}
+</alert>"""
+
+
+def make_feed(country: str, base_url: str, entries: List[Tuple[str, str]]) -> str:
+    """Return a legacy Atom feed listing (identifier, EMMA_ID) entries."""
+    items = []
+    for identifier, area_code in entries:
+        items.append(f"""
+    <entry>
+        <cap:geocode>
+            <valueName>EMMA_ID</valueName>
+            <value>{area_code}</value>
+        </cap:geocode>
+        <link href="{base_url}/api/v1/warnings/feeds-{country}/{identifier}" type="application/cap+xml"/>
+        <cap:identifier>{identifier}</cap:identifier>
+        <cap:areaDesc>Area {area_code}</cap:areaDesc>
+        <cap:event>Warning</cap:event>
+        <cap:sent>2025-02-04T10:45:01+00:00</cap:sent>
+        <cap:expires>2025-02-06T10:36:06+00:00</cap:expires>
+        <cap:effective>2025-02-04T10:46:01+00:00</cap:effective>
+        <cap:onset>2025-02-04T10:45:01+00:00</cap:onset>
+        <cap:certainty>Likely</cap:certainty>
+        <cap:severity>Moderate</cap:severity>
+        <cap:urgency>Future</cap:urgency>
+    </entry>""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:cap="urn:oasis:names:tc:emergency:cap:1.2">
+    <link href="{base_url}/feeds/meteoalarm-legacy-atom-{country}" rel="self"/>{''.join(items)}
+</feed>"""
+
+
+def make_geocodes(rng: random.Random, countries: List[str], areas: int, points: int = 60) -> dict:
+    """Return a geocodes FeatureCollection with EMMA_ID polygons for every country."""
+    features = []
+    for country in countries:
+        for index in range(areas):
+            lat, lon = rng.uniform(36, 70), rng.uniform(-10, 30)
+            ring = [[round(lon + rng.uniform(-0.5, 0.5), 5), round(lat + rng.uniform(-0.5, 0.5), 5)]
+                    for _ in range(points - 1)]
+            ring.append(ring[0])
+            features.append({
+                'type': 'Feature',
+                'properties': {'type': 'EMMA_ID', 'code': emma_id(country, index)},
+                'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+            })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+class Corpus:
+    """A synthetic set of countries, Atom feeds and CAP documents."""
+
+    def __init__(self, alerts: int, countries: int = 10, languages: int = 2, polygon_share: float = 0.2,
+                 areas: int = 50, seed: int = 0):
+        rng = random.Random(seed)
+        self.countries = [f"country{index:02d}" for index in range(countries)]
+        self.areas = areas
+        self.documents: Dict[str, str] = {}
+        self.entries: Dict[str, List[Tuple[str, str]]] = {country: [] for country in self.countries}
+        for index in range(alerts):
+            country = self.countries[index % countries]
+            identifier = f"2.49.0.0.{index}.0.{country}"
+            area_code = emma_id(country, rng.randrange(areas))
+            polygon_points = rng.randint(10, 200) if rng.random() < polygon_share else 0
+            self.documents[identifier] = make_cap(rng, country, identifier, area_code, languages, polygon_points)
+            self.entries[country].append((identifier, area_code))
+        self.geocodes = make_geocodes(rng, self.countries, areas)
+
+    def feed(self, country: str, base_url: str) -> str:
+        return make_feed(country, base_url, self.entries[country])
@@ -0,0 +1,166 @@
+"""
+Benchmarks for the hot paths of meteoalarm on synthetic corpora.
+
+    PYTHONPATH=src python benchmarks/run.py                 # compare with baselines.json
+    PYTHONPATH=src python benchmarks/run.py --record        # overwrite baselines.json
+    PYTHONPATH=src python benchmarks/run.py --sizes 50 1000 --latency 0.02 --failure-rate 0.05
+
+Every benchmark reports the best of `--repeat` runs in milliseconds.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+
+from corpus import Corpus, LANGUAGES
+from server import FeedServer
+
+from meteoalarm import MeteoAlarm
+from meteoalarm.geocodes import GeocodeStore, compile_geocodes
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    """Return the fastest of `repeat` runs of fn in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def local_client(server: FeedServer, geocodes: GeocodeStore):
+    """MeteoAlarm pointed at the local feed server and the synthetic geocodes."""
+
+    class LocalMeteoAlarm(MeteoAlarm):
+        def _load_urls(self):
+            return server.urls
+
+        def _load_geocodes(self):
+            return geocodes
+
+    return LocalMeteoAlarm
+
+
+def bench_geocodes(corpus: Corpus, repeat: int, directory: str) -> Dict[str, float]:
+    """Cold load of the geocode store plus a lookup of every area, from JSON and from the compiled asset."""
+    source = os.path.join(directory, 'geocodes.json')
+    target = os.path.join(directory, 'geocodes.bin')
+    with open(source, 'w') as file:
+        json.dump(corpus.geocodes, file)
+    compile_geocodes(source, target)
+
+    def from_json():
+        with open(source, 'r') as file:
+            store = GeocodeStore.from_feature_collection(json.load(file))
+        for code in store:
+            store[code]
+
+    def from_compiled():
+        with open(target, 'rb') as file:
+            store = GeocodeStore.from_compiled(file)
+        for code in store:
+            store[code]
+
+    return {
+        '_load_geocodes[json]': best_of(from_json, repeat),
+        '_load_geocodes[compiled]': best_of(from_compiled, repeat),
+    }
+
+
+def bench_size(size: int, args, geocodes: GeocodeStore) -> Dict[str, float]:
+    corpus = Corpus(size, countries=args.countries, languages=args.languages, seed=args.seed)
+    results = {}
+    with FeedServer(corpus, latency=args.latency, failure_rate=args.failure_rate, seed=args.seed) as server:
+        client = local_client(server, geocodes)
+        results['__init__'] = best_of(lambda: client(corpus.countries, max_workers=args.workers), args.repeat)
+        results['__init__[lazy]'] = best_of(
+            lambda: client(corpus.countries, max_workers=args.workers, lazy=True), args.repeat)
+        if args.processes:
+            # Fetch everything again on a warm instance, so that the process pool is already running
+            def refetch(alarm):
+                alarm._cap_cache.clear()
+                alarm._get_all_warnings(corpus.countries)
+
+            alarm = client(corpus.countries, max_workers=args.workers)
+            results['refetch[threads]'] = best_of(lambda: refetch(alarm), args.repeat)
+            alarm = client(corpus.countries, max_workers=args.workers, processes=args.processes)
+            results[f'refetch[processes={args.processes}]'] = best_of(lambda: refetch(alarm), args.repeat)
+            alarm.close()
+        alarm = client(corpus.countries, max_workers=args.workers)
+
+    sample = [(corpus.documents[identifier], country)
+              for country, entries in corpus.entries.items() for identifier, _ in entries][:500]
+    parse = best_of(lambda: [alarm._parse_warning_xml(xml, country) for xml, country in sample], args.repeat)
+    results['_parse_warning_xml[per doc]'] = parse / len(sample)
+
+    def filter_cold():
+        alarm._set_warnings(alarm._warnings)
+        alarm.filter(severity='Severe', awareness_type='Wind')
+
+    results['filter[cold]'] = best_of(filter_cold, args.repeat)
+    results['filter[warm]'] = best_of(lambda: alarm.filter(severity='Severe', awareness_type='Wind'), args.repeat)
+    results['filter[range]'] = best_of(lambda: alarm.filter(onset__gte='2025-02-05T00:00:00+00:00'), args.repeat)
+    results['available_languages'] = best_of(alarm.available_languages, args.repeat)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 1000, 10000],
+                        help="number of alerts per corpus")
+    parser.add_argument('--countries', type=int, default=10)
+    parser.add_argument('--languages', type=int, default=3, choices=range(1, len(LANGUAGES) + 1))
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=0, help="also time parsing in a process pool")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--record', action='store_true', help="write the results to baselines.json")
+    args = parser.parse_args(argv)
+    random.seed(args.seed)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        geocode_corpus = Corpus(0, countries=args.countries, seed=args.seed)
+        results['geocodes'] = bench_geocodes(geocode_corpus, args.repeat, directory)
+    geocodes = GeocodeStore.from_feature_collection(geocode_corpus.geocodes)
+    for size in args.sizes:
+        results[str(size)] = bench_size(size, args, geocodes)
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES, 'r') as file:
+            baselines = json.load(file).get('results', {})
+
+    for group, timings in results.items():
+        print(f"\n{group}" if group == 'geocodes' else f"\n{group} alerts")
+        for name, value in timings.items():
+            baseline = baselines.get(group, {}).get(name)
+            change = f"  ({value / baseline:.2f}x baseline)" if baseline else ''
+            print(f"  {name:32} {value:10.3f} ms{change}")
+
+    if args.record:
+        with open(BASELINES, 'w') as file:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'options': {key: value for key, value in vars(args).items() if key != 'record'},
+                'results': {group: {name: round(value, 3) for name, value in timings.items()}
+                            for group, timings in results.items()},
+            }, file, indent=2)
+            file.write('\n')
+        print(f"\nRecorded baselines in {BASELINES}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
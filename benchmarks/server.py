@@ -0,0 +1,81 @@
+"""Local HTTP stand-in for feeds.meteoalarm.org serving a synthetic corpus."""
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+from corpus import Corpus
+
+
+class FeedServer:
+    """
+    Serve the Atom feeds and CAP documents of a corpus on localhost.
+    Every response is delayed by `latency` seconds, and a `failure_rate`
+    share of requests fails with HTTP 503.
+    """
+
+    def __init__(self, corpus: Corpus, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.corpus = corpus
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def urls(self) -> Dict[str, str]:
+        """Country URL table in the format of MeteoAlarm_urls.yaml."""
+        return {country: f"{self.base_url}/feeds/meteoalarm-legacy-atom-{country}"
+                for country in self.corpus.countries}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    fail = server._rng.random() < server.failure_rate
+                if server.latency:
+                    time.sleep(server.latency)
+
+                body = None
+                if not fail and self.path.startswith('/feeds/meteoalarm-legacy-atom-'):
+                    country = self.path.rsplit('-', 1)[-1]
+                    if country in server.corpus.entries:
+                        body = server.corpus.feed(country, server.base_url)
+                elif not fail and self.path.startswith('/api/v1/warnings/'):
+                    body = server.corpus.documents.get(self.path.rsplit('/', 1)[-1])
+
+                status = 503 if fail else 200 if body is not None else 404
+                payload = (body or '').encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/xml')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> 'FeedServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
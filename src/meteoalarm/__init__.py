@@ -1 +1,8 @@
-from .meteoalarm import MeteoAlarm, Alert
\ No newline at end of file
+from .meteoalarm import MeteoAlarm, Alert
+from .aio import AsyncMeteoAlarm
+from .cache import AlertCache
+from .stats import FetchStats
+from .watch import AlertEvent, Watcher
+from .fetcher import CircuitBreaker
+from .store import AlertStore
+from .server import SnapshotServer
@@ -0,0 +1,42 @@
+import argparse
+import logging
+import sys
+
+from .meteoalarm import MeteoAlarm, _load_url_table
+from .server import SnapshotServer
+
+
+def serve(args):
+    countries = args.countries or sorted(_load_url_table())
+    alarm = MeteoAlarm(countries, max_workers=args.max_workers, languages=args.languages, deadline=args.deadline)
+    server = SnapshotServer(alarm, (args.host, args.port), interval=args.interval)
+    logging.getLogger(__name__).info("Serving %d warnings for %d countries on %s",
+                                     len(alarm), len(countries), server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        alarm.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m meteoalarm')
+    commands = parser.add_subparsers(dest='command', required=True)
+    parser_serve = commands.add_parser('serve', help="serve a shared, periodically refreshed snapshot over HTTP")
+    parser_serve.add_argument('--countries', nargs='+', help="countries to serve (default: all)")
+    parser_serve.add_argument('--host', default='127.0.0.1')
+    parser_serve.add_argument('--port', type=int, default=8787)
+    parser_serve.add_argument('--interval', type=float, default=300, help="seconds between refreshes")
+    parser_serve.add_argument('--languages', nargs='+', help="only parse texts in these languages")
+    parser_serve.add_argument('--max-workers', type=int, default=8)
+    parser_serve.add_argument('--deadline', type=float, help="seconds after which a refresh keeps what it has")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    serve(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
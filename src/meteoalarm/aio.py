@@ -0,0 +1,123 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+from .cache import AlertCache
+from .fetcher import CircuitBreaker
+from .meteoalarm import Alert, MeteoAlarm
+from .stats import Hook
+from .store import AlertStore
+
+
+class AsyncMeteoAlarm(MeteoAlarm):
+    """
+    Asyncio counterpart of MeteoAlarm.
+    Nothing is fetched on construction; call `await fetch()` to load the
+    warnings, or use `async for` to receive each Alert as soon as its CAP
+    document has been parsed. The blocking downloads and parsing run on
+    `max_workers` threads of the instance rather than the loop's default
+    executor, so the event loop and its executor stay free for other work.
+    """
+
+    def __init__(self, countries: List[str], max_workers: int = 8, max_per_host: int = 4,
+                 lazy: bool = False, cache: Union[str, AlertCache, None] = None,
+                 languages: Optional[List[str]] = None, hook: Optional[Hook] = None,
+                 timeout: Union[float, Tuple[float, float]] = (5.0, 30.0), retries: int = 2, backoff: float = 0.5,
+                 deadline: Optional[float] = None, breaker: Optional[CircuitBreaker] = None,
+                 server: Optional[str] = None):
+        """Initialize for the specified countries without fetching any warnings."""
+        self._configure(countries, max_workers, max_per_host, lazy, cache, languages, hook, None,
+                        timeout, retries, backoff, deadline, breaker, server)
+        self._set_warnings([])
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='meteoalarm')
+        # Shared by all fetches of the instance on the same loop
+        self._limits: Tuple[Optional[asyncio.AbstractEventLoop], Optional[asyncio.Semaphore]] = (None, None)
+
+    def _limit(self) -> asyncio.Semaphore:
+        """Semaphore bounding the number of concurrent fetch steps of this instance on the running loop."""
+        loop = asyncio.get_running_loop()
+        limit_loop, limit = self._limits
+        if limit_loop is not loop:
+            limit = asyncio.Semaphore(self._fetcher.max_workers)
+            self._limits = (loop, limit)
+        return limit
+
+    async def _run(self, limit: asyncio.Semaphore, fn, *args):
+        """Run a blocking fetch step on a worker thread of the instance under the concurrency limit."""
+        async with limit:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def close(self):
+        """Stop the worker threads, and close the pooled HTTP connections."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        super().close()
+
+    async def _fetch(self, countries: List[str], conditional: bool) -> List[Alert]:
+        """Fetch feeds and new CAP documents, then assemble warnings in feed order."""
+        self._start_stats()
+        limit = self._limit()
+        feeds = await asyncio.gather(*(self._run(limit, self._get_feed_jobs, country, conditional)
+                                       for country in countries))
+        jobs = [job for feed_jobs in feeds for job in feed_jobs]
+        await asyncio.gather(*(self._run(limit, self._get_warning, job) for job in jobs))
+        self._set_warnings(self._collect_warnings(self.countries))
+        self._finish_stats(warning for warning in self._warnings if warning.country in countries)
+        return self._warnings
+
+    async def fetch(self) -> List[Alert]:
+        """Fetch all warnings, keeping the order of the countries and feed entries."""
+        return await self._fetch(self.countries, conditional=False)
+
+    async def refresh(self, countries: Optional[List[str]] = None) -> List[Alert]:
+        """Bring the warnings up to date with the feeds, see MeteoAlarm.refresh."""
+        for country in countries or []:
+            if country not in self.countries:
+                raise ValueError(f"Country not configured for this instance: {country}")
+        return await self._fetch(countries or self.countries, conditional=True)
+
+    def __aiter__(self) -> AsyncIterator[Alert]:
+        """Iterate asynchronously over warnings in the order they are parsed."""
+        return self.iter_alerts()
+
+    async def iter_alerts(self) -> AsyncIterator[Alert]:
+        """
+        Yield each Alert as soon as its CAP document is parsed.
+        CAP downloads for a country start as soon as its feed has arrived;
+        warnings that are already cached are yielded right away. Update and
+        Cancel messages are applied as they arrive, see MeteoAlarm.iter_warnings.
+        """
+        self._start_stats()
+        stats = self.stats
+        store = AlertStore()
+        limit = self._limit()
+        feed_tasks = {asyncio.ensure_future(self._run(limit, self._get_feed_jobs, country)): country
+                      for country in self.countries}
+        pending = set(feed_tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task not in feed_tasks:
+                        warning: Optional[Alert] = task.result()
+                        if warning and (self.lazy or store.admit(warning)):
+                            stats.count_alerts((warning,))
+                            yield warning
+                        continue
+
+                    jobs = task.result()
+                    country = feed_tasks[task]
+                    new_links = {link for _, link, _ in jobs}
+                    for link, _ in self._feed_entries.get(country, []):
+                        cached = self._cap_cache.get((country, link))
+                        if link in new_links or cached is None:
+                            continue
+                        if self.lazy or store.admit(cached[1]):
+                            stats.count_alerts((cached[1],))
+                            yield cached[1]
+                    pending.update(asyncio.ensure_future(self._run(limit, self._get_warning, job))
+                                   for job in jobs)
+            self._set_warnings(self._collect_warnings(self.countries))
+        finally:
+            for task in pending:
+                task.cancel()
+            self._finish_stats(())
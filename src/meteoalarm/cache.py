@@ -0,0 +1,98 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class AlertCache:
+    """
+    Persistent SQLite cache of parsed warnings, keyed by country and CAP link.
+    An entry is only used while its feed lists the same link and version.
+    Entries are evicted once they are older than `ttl` seconds, once the
+    warning has expired, and oldest first beyond `max_entries`.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400, max_entries: int = 50000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS alerts ("
+                " country TEXT NOT NULL,"
+                " url TEXT NOT NULL,"
+                " version TEXT NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " expires REAL,"
+                " data TEXT NOT NULL,"
+                " PRIMARY KEY (country, url))"
+            )
+
+    def load(self, country: str, entries: Iterable[Tuple[str, str]]) -> Dict[str, dict]:
+        """Return the cached alert data by link for the (link, version) entries of a feed."""
+        versions = dict(entries)
+        if not versions:
+            return {}
+        now = time.time()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT url, version, data FROM alerts"
+                " WHERE country = ? AND stored_at >= ? AND (expires IS NULL OR expires > ?)",
+                (country, now - self.ttl, now)
+            ).fetchall()
+        return {url: json.loads(data) for url, version, data in rows if versions.get(url) == version}
+
+    def store(self, country: str, url: str, version: str, data: dict, expires: Optional[datetime]):
+        """Store the data of a parsed alert for a feed entry."""
+        self.store_many([(country, url, version, data, expires)])
+
+    def store_many(self, entries: Iterable[Tuple[str, str, str, dict, Optional[datetime]]]):
+        """Store the (country, url, version, data, expires) of many parsed alerts in one transaction."""
+        now = time.time()
+        rows = [(country, url, version, now, expires.timestamp() if expires else None, json.dumps(data))
+                for country, url, version, data, expires in entries]
+        if not rows:
+            return
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO alerts (country, url, version, stored_at, expires, data)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def retain(self, country: str, urls: List[str]):
+        """Remove the cached alerts of a country whose links are no longer in its feed."""
+        with self._lock, self._connection:
+            cached = [url for url, in self._connection.execute(
+                "SELECT url FROM alerts WHERE country = ?", (country,))]
+            listed = set(urls)
+            self._connection.executemany(
+                "DELETE FROM alerts WHERE country = ? AND url = ?",
+                [(country, url) for url in cached if url not in listed]
+            )
+
+    def evict(self):
+        """Remove stale and expired entries, then the oldest ones beyond max_entries."""
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM alerts WHERE stored_at < ? OR expires <= ?", (now - self.ttl, now)
+            )
+            self._connection.execute(
+                "DELETE FROM alerts WHERE rowid IN"
+                " (SELECT rowid FROM alerts ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,159 @@
+import importlib
+import json
+from array import array
+from datetime import timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from .meteoalarm import Alert
+
+# Exported columns, in order: scalar alert fields, texts in the chosen language,
+# and the sender and area details
+TEXT_COLUMNS = ('event', 'headline', 'description')
+DATETIME_COLUMNS = ('onset', 'effective', 'expires', 'sent')
+# Columns holding values from small enumerations, dictionary-encoded in Arrow
+CATEGORICAL_COLUMNS = ('country', 'category', 'urgency', 'severity', 'certainty', 'awareness_level',
+                       'awareness_type', 'msg_type')
+COLUMNS = ('identifier', 'country', 'category', 'urgency', 'severity', 'certainty', 'awareness_level',
+           'awareness_type', 'msg_type') + DATETIME_COLUMNS + TEXT_COLUMNS + (
+           'language', 'sender', 'sender_name', 'area_desc', 'emma_id')
+
+
+def _require(module: str, extra: str, feature: str):
+    """Import an optional dependency, explaining how to install it if it is missing."""
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise ImportError(f"{feature} requires {module}; install it with `pip install meteoalarm[{extra}]`") from None
+
+
+def _localized(alert: 'Alert', lang: str, texts: Dict[str, str]) -> Optional[str]:
+    return alert._get_localized_text(lang, texts) if texts and alert.description else texts.get(lang)
+
+
+def _row(alert: 'Alert', lang: str) -> Dict[str, Any]:
+    """The exported values of one warning, by column."""
+    language = lang if lang in alert.description else next(
+        (code for code in alert.description if code.startswith('en')), next(iter(alert.description), None))
+    sender = alert.sender or {}
+    area = alert.area or {}
+    return {
+        'identifier': alert.identifier,
+        'country': alert.country,
+        'category': alert.category,
+        'urgency': alert.urgency,
+        'severity': alert.severity,
+        'certainty': alert.certainty,
+        'awareness_level': alert.awareness_level,
+        'awareness_type': alert.awareness_type,
+        'msg_type': alert.msg_type,
+        'onset': alert.onset,
+        'effective': alert.effective,
+        'expires': alert.expires,
+        'sent': alert.sent,
+        'event': _localized(alert, lang, alert.event),
+        'headline': _localized(alert, lang, alert.headline),
+        'description': _localized(alert, lang, alert.description),
+        'language': language,
+        'sender': sender.get('sender'),
+        'sender_name': sender.get('senderName'),
+        'area_desc': area.get('areaDesc'),
+        'emma_id': area.get('EMMA_ID'),
+    }
+
+
+def to_columns(alerts: Sequence['Alert'], lang: str = "en") -> Dict[str, List[Any]]:
+    """
+    Return the warnings as columns of Python values, one per scalar field.
+    Texts are taken in `lang`, falling back as Alert.get_description does.
+    """
+    columns = {name: [] for name in COLUMNS}
+    for alert in alerts:
+        for name, value in _row(alert, lang).items():
+            columns[name].append(value)
+    return columns
+
+
+def to_records(alerts: Sequence['Alert'], lang: str = "en"):
+    """
+    Return the warnings as a NumPy record array, one field per column.
+    Times are UTC datetime64[us] (NaT if missing); strings are objects.
+    Requires numpy.
+    """
+    np = _require('numpy', 'numpy', "to_records")
+    columns = to_columns(alerts, lang)
+    arrays = []
+    for name, values in columns.items():
+        if name in DATETIME_COLUMNS:
+            values = [value.astimezone(timezone.utc).replace(tzinfo=None) if value is not None else None
+                      for value in values]
+            arrays.append(np.array(values, dtype='datetime64[us]'))
+        else:
+            arrays.append(np.array(values, dtype=object))
+    return np.rec.fromarrays(arrays, names=list(columns))
+
+
+def to_arrow(alerts: Sequence['Alert'], lang: str = "en", geometry: bool = False):
+    """
+    Return the warnings as a pyarrow Table, one column per field.
+    Enumerated fields are dictionary-encoded and times are UTC timestamps.
+    With `geometry`, a GeoJSON string column is added. Requires pyarrow.
+    """
+    pa = _require('pyarrow', 'arrow', "to_arrow")
+    columns = to_columns(alerts, lang)
+    arrays = {}
+    for name, values in columns.items():
+        if name in DATETIME_COLUMNS:
+            arrays[name] = pa.array(values, type=pa.timestamp('us', tz='UTC'))
+        elif name in CATEGORICAL_COLUMNS:
+            arrays[name] = pa.array(values, type=pa.string()).dictionary_encode()
+        else:
+            arrays[name] = pa.array(values, type=pa.string())
+    if geometry:
+        arrays['geometry'] = pa.array([alert.geometry for alert in alerts], type=pa.string())
+    return pa.table(arrays)
+
+
+def _geometry(alert: 'Alert', parsed: Dict[str, dict], tolerance: Optional[float]) -> Optional[dict]:
+    """
+    GeoJSON geometry of a warning. Packed polygons are converted directly;
+    geometry strings shared between warnings of the same area are parsed once.
+    """
+    shape = alert._shape
+    if tolerance is not None:
+        shape = alert.geometry_at(tolerance)
+    elif type(shape) is array:
+        return {'type': 'Polygon', 'coordinates': [[[shape[i], shape[i + 1]] for i in range(0, len(shape), 2)]]}
+    if shape is None:
+        return None
+    geometry = parsed.get(shape)
+    if geometry is None:
+        geometry = parsed[shape] = json.loads(shape)
+    return geometry
+
+
+def to_feature_collection(alerts: Sequence['Alert'], lang: str = "en", tolerance: Optional[float] = None) -> dict:
+    """
+    Return the warnings as a GeoJSON FeatureCollection, with the columns of
+    to_columns() as properties and times as ISO strings. Features carry the
+    bounding box of their area, and features of the same area share one
+    geometry object. With `tolerance`, geometries are simplified, see
+    Alert.geometry_at.
+    """
+    parsed: Dict[str, dict] = {}
+    features = []
+    for alert in alerts:
+        properties = _row(alert, lang)
+        for name in DATETIME_COLUMNS:
+            if properties[name] is not None:
+                properties[name] = properties[name].isoformat()
+        feature = {
+            'type': 'Feature',
+            'id': alert.identifier or None,
+            'geometry': _geometry(alert, parsed, tolerance),
+            'properties': properties,
+        }
+        if alert.bbox is not None:
+            feature['bbox'] = list(alert.bbox)
+        features.append(feature)
+    return {'type': 'FeatureCollection', 'features': features}
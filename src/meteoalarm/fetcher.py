@@ -0,0 +1,179 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# Statuses of responses that are worth retrying
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request cannot complete before the deadline of its fetch."""
+
+
+class CircuitOpen(Exception):
+    """Raised instead of a request while the circuit of its key is open."""
+
+
+def is_transient(error: Exception) -> bool:
+    """Check whether a failed request may succeed when retried: connection errors, timeouts, 429 and 5xx."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    response = getattr(error, 'response', None)
+    return isinstance(error, requests.HTTPError) and response is not None and \
+        response.status_code in RETRY_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker per key, e.g. per country.
+    After `threshold` consecutive failures, the circuit of a key opens and
+    requests are refused for `cooldown` seconds. Then a single trial request
+    is let through: its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 300):
+        if threshold < 1:
+            raise ValueError("threshold must be at least 1")
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures: Dict[str, int] = {}
+        self._opened: Dict[str, float] = {}
+        self._trials = set()
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        """Check whether a request for key may be made now."""
+        with self._lock:
+            opened = self._opened.get(key)
+            if opened is None:
+                return True
+            if key in self._trials or time.monotonic() - opened < self.cooldown:
+                return False
+            self._trials.add(key)
+            return True
+
+    def is_open(self, key: str) -> bool:
+        with self._lock:
+            return key in self._opened
+
+    def success(self, key: str):
+        """Record a successful request, closing the circuit of key."""
+        with self._lock:
+            self._failures.pop(key, None)
+            self._opened.pop(key, None)
+            self._trials.discard(key)
+
+    def failure(self, key: str):
+        """Record a failed request, opening the circuit of key at the threshold or after a failed trial."""
+        with self._lock:
+            failures = self._failures[key] = self._failures.get(key, 0) + 1
+            if failures >= self.threshold or key in self._trials:
+                self._opened[key] = time.monotonic()
+            self._trials.discard(key)
+
+
+class Fetcher:
+    """
+    Shared HTTP session with bounded parallelism.
+    At most `max_workers` requests run at once, and at most `max_per_host`
+    of them go to the same host. Connections are pooled and kept alive.
+    Requests time out after `timeout` seconds, a (connect, read) pair or a
+    single value for both, and transient failures are retried up to
+    `retries` times with exponential backoff starting at `backoff` seconds.
+    """
+
+    def __init__(self, max_workers: int = 8, max_per_host: int = 4,
+                 session: Optional[requests.Session] = None,
+                 timeout: Union[float, Tuple[float, float]] = (5.0, 30.0), retries: int = 2, backoff: float = 0.5):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_per_host < 1:
+            raise ValueError("max_per_host must be at least 1")
+        if retries < 0:
+            raise ValueError("retries cannot be negative")
+
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.session = session or requests.Session()
+        self.timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        self.retries = retries
+        self.backoff = backoff
+
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_per_host)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        """Return the semaphore limiting concurrent requests to the host of url."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return slot
+
+    def _timeout(self, deadline: Optional[float]) -> Tuple[float, float]:
+        """Return the (connect, read) timeout of a request, capped by the time left until the deadline."""
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Fetch deadline exceeded")
+        return min(self.timeout[0], remaining), min(self.timeout[1], remaining)
+
+    def get(self, url: str, deadline: Optional[float] = None, **kwargs) -> requests.Response:
+        """
+        GET url through the pooled session and raise on HTTP errors.
+        Transient failures are retried with exponential backoff and jitter;
+        no attempt is started after the time.monotonic() `deadline`, and
+        DeadlineExceeded is raised once the deadline cuts a request or a
+        retry short.
+        """
+        attempt = 0
+        while True:
+            timeout = self._timeout(deadline)
+            try:
+                with self._host_slot(url):
+                    response = self.session.get(url, timeout=timeout, **kwargs)
+                response.raise_for_status()
+                return response
+            except Exception as e:
+                if isinstance(e, requests.Timeout) and timeout != self.timeout:
+                    # Timed out on the time left, not the configured timeout
+                    raise DeadlineExceeded("Fetch deadline exceeded") from e
+                if attempt >= self.retries or not is_transient(e):
+                    raise
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise DeadlineExceeded("Fetch deadline exceeded before a retry") from e
+            time.sleep(delay)
+            attempt += 1
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T]) -> List[R]:
+        """Apply fn to all items in parallel and return the results in input order."""
+        return list(self.imap(fn, items))
+
+    def imap(self, fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+        """Apply fn to all items in parallel and yield the results in input order as they are ready."""
+        items = list(items)
+        if len(items) <= 1 or self.max_workers == 1:
+            yield from (fn(item) for item in items)
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as pool:
+            yield from pool.map(fn, items)
+
+    def close(self):
+        """Close the underlying session and its pooled connections."""
+        self.session.close()
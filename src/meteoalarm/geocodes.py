@@ -0,0 +1,133 @@
+import json
+import mmap
+import struct
+import sys
+from functools import lru_cache
+from importlib import resources
+from typing import Dict, Iterator, Mapping, Optional, Tuple
+
+from .spatial import BBox, geometry_bbox, shape_bbox
+
+# Compiled geocode asset: magic, length of the JSON index, the index mapping each
+# EMMA_ID to the (offset, length) of its geometry followed by its bounding box,
+# then the GeoJSON geometries.
+COMPILED_MAGIC = b'MAGC'
+COMPILED_HEADER = struct.Struct('<4sI')
+
+
+class GeocodeStore(Mapping[str, str]):
+    """
+    Read-only mapping from EMMA_ID to the GeoJSON geometry string of the area.
+    Backed by the compiled `geocodes.bin` asset when available, which is
+    memory-mapped so that a lookup only decodes that one geometry. Otherwise
+    `geocodes.json` is parsed once and geometries are serialized on lookup.
+    Decoded geometries are kept, so alerts for the same area share one string.
+    Bounding boxes are read from the compiled index without decoding the
+    geometry, or computed once from the parsed source.
+    """
+
+    def __init__(self, index: Dict[str, Tuple[int, int]] = None, data: Optional[mmap.mmap] = None,
+                 geometries: Dict[str, dict] = None, bboxes: Dict[str, BBox] = None):
+        self._index = index or {}
+        self._data = data
+        self._geometries = geometries or {}
+        self._decoded: Dict[str, str] = {}
+        self._bboxes = bboxes or {}
+
+    @classmethod
+    def from_compiled(cls, file) -> 'GeocodeStore':
+        """Create a store from an open binary file of the compiled asset."""
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = COMPILED_HEADER.unpack_from(data)
+        if magic != COMPILED_MAGIC:
+            raise ValueError("Not a compiled geocodes file")
+        start = COMPILED_HEADER.size + index_length
+        index = {}
+        bboxes = {}
+        for code, entry in json.loads(data[COMPILED_HEADER.size:start]).items():
+            index[code] = (start + entry[0], entry[1])
+            # Files compiled before bounding boxes were added only hold (offset, length)
+            if len(entry) == 6:
+                bboxes[code] = tuple(entry[2:])
+        return cls(index=index, data=data, bboxes=bboxes)
+
+    @classmethod
+    def from_feature_collection(cls, data: dict) -> 'GeocodeStore':
+        """Create a store from the EMMA_ID features of a GeoJSON FeatureCollection."""
+        return cls(geometries={
+            feature['properties']['code']: feature['geometry']
+            for feature in data['features']
+            if feature['properties']['type'] == 'EMMA_ID'
+        })
+
+    def __getitem__(self, code: str) -> str:
+        geometry = self._decoded.get(code)
+        if geometry is not None:
+            return geometry
+        if code in self._index:
+            offset, length = self._index[code]
+            geometry = self._data[offset:offset + length].decode('utf-8')
+        elif code in self._geometries:
+            geometry = json.dumps(self._geometries[code])
+        else:
+            raise KeyError(code)
+        self._decoded[code] = geometry
+        return geometry
+
+    def bbox(self, code: Optional[str]) -> Optional[BBox]:
+        """Return the (min_lon, min_lat, max_lon, max_lat) bounding box of an area, if known."""
+        bbox = self._bboxes.get(code)
+        if bbox is None and code in self:
+            if code in self._geometries:
+                bbox = geometry_bbox(self._geometries[code])
+            else:
+                bbox = shape_bbox(self[code])
+            self._bboxes[code] = bbox
+        return bbox
+
+    def __contains__(self, code) -> bool:
+        return code in self._index or code in self._geometries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index or self._geometries)
+
+    def __len__(self) -> int:
+        return len(self._index or self._geometries)
+
+
+@lru_cache(maxsize=None)
+def load_geocodes() -> GeocodeStore:
+    """Load the geocode store once per process, preferring the compiled asset."""
+    assets = resources.files('meteoalarm.assets')
+    if assets.joinpath('geocodes.bin').is_file():
+        with resources.as_file(assets.joinpath('geocodes.bin')) as path, open(path, 'rb') as file:
+            return GeocodeStore.from_compiled(file)
+    with resources.as_file(assets.joinpath('geocodes.json')) as path, open(path, 'r') as file:
+        return GeocodeStore.from_feature_collection(json.load(file))
+
+
+def compile_geocodes(source: str, target: str):
+    """Compile the EMMA_ID geometries of a geocodes.json file into the indexed binary asset."""
+    with open(source, 'r') as file:
+        store = GeocodeStore.from_feature_collection(json.load(file))
+
+    index = {}
+    blobs = []
+    offset = 0
+    for code in store:
+        blob = store[code].encode('utf-8')
+        index[code] = (offset, len(blob)) + (store.bbox(code) or ())
+        blobs.append(blob)
+        offset += len(blob)
+
+    index_blob = json.dumps(index, separators=(',', ':')).encode('utf-8')
+    with open(target, 'wb') as file:
+        file.write(COMPILED_HEADER.pack(COMPILED_MAGIC, len(index_blob)))
+        file.write(index_blob)
+        file.writelines(blobs)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python -m meteoalarm.geocodes <geocodes.json> <geocodes.bin>")
+    compile_geocodes(sys.argv[1], sys.argv[2])
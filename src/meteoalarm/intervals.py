@@ -0,0 +1,98 @@
+import math
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union
+
+import pytz
+
+if TYPE_CHECKING:
+    from .meteoalarm import Alert
+
+# (start, end, position) with start/end as POSIX timestamps
+Interval = Tuple[float, float, int]
+
+
+def to_timestamp(value: Union[datetime, str, None], default: float) -> float:
+    """Convert a datetime or ISO string to a POSIX timestamp; naive values are taken as UTC."""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = pytz.UTC.localize(value)
+    return value.timestamp()
+
+
+class _Node:
+    """Node of a centered interval tree holding the intervals that contain its center."""
+
+    def __init__(self, intervals: List[Interval]):
+        points = sorted(point for start, end, _ in intervals for point in (start, end) if math.isfinite(point))
+        self.center = points[len(points) // 2] if points else 0.0
+
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        self.by_start = sorted(here, key=lambda interval: interval[0])
+        self.by_end = sorted(here, key=lambda interval: interval[1], reverse=True)
+        self.left = _Node(left) if left else None
+        self.right = _Node(right) if right else None
+
+
+class IntervalIndex:
+    """
+    Centered interval tree over the validity windows of a snapshot's warnings.
+    A warning is valid from its onset (or effective time) until it expires;
+    missing bounds are open. Queries take logarithmic time plus the number
+    of matching warnings, and return them in snapshot order.
+    """
+
+    def __init__(self, alerts: Sequence['Alert']):
+        self.alerts = list(alerts)
+        intervals = []
+        for position, alert in enumerate(self.alerts):
+            start = to_timestamp(alert.onset or alert.effective, -math.inf)
+            end = to_timestamp(alert.expires, math.inf)
+            # A warning that expires before its onset is never valid
+            if start <= end:
+                intervals.append((start, end, position))
+        self._root = _Node(intervals) if intervals else None
+
+    def active_at(self, t: Union[datetime, str]) -> List['Alert']:
+        """Return the warnings valid at time t (start <= t < end)."""
+        return self.overlapping(t, None)
+
+    def overlapping(self, start: Union[datetime, str], end: Optional[Union[datetime, str]]) -> List['Alert']:
+        """Return the warnings whose validity overlaps [start, end); without end, those valid at start."""
+        a = to_timestamp(start, -math.inf)
+        b = to_timestamp(end, math.nextafter(a, math.inf))
+        positions = []
+        node = self._root
+        stack = [node] if node else []
+        while stack:
+            node = stack.pop()
+            if b <= node.center:
+                # Every interval here ends at or after the center, hence after a
+                for interval in node.by_start:
+                    if interval[0] >= b:
+                        break
+                    if interval[1] > a:
+                        positions.append(interval[2])
+                if node.left:
+                    stack.append(node.left)
+            elif a >= node.center:
+                # Every interval here starts at or before the center, hence before b
+                for interval in node.by_end:
+                    if interval[1] <= a:
+                        break
+                    positions.append(interval[2])
+                if node.right:
+                    stack.append(node.right)
+            else:
+                positions.extend(interval[2] for interval in node.by_start)
+                stack.extend(child for child in (node.left, node.right) if child)
+        return [self.alerts[position] for position in sorted(positions)]
@@ -1,22 +1,168 @@
 import datetime
-from dataclasses import dataclass
+import hashlib
+import inspect
+import math
+import multiprocessing
+from array import array
+from dataclasses import InitVar, dataclass
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
 from importlib import resources
-from typing import Dict, List, Optional, Set
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 import requests
 import xml.etree.ElementTree as ET
 from datetime import datetime
 import pytz
+import logging
 import os
+import sys
+import time
+import weakref
 import yaml
 import json
 
+from . import export
+from .cache import AlertCache
+from .fetcher import CircuitBreaker, CircuitOpen, DeadlineExceeded, Fetcher, is_transient
+from .geocodes import GeocodeStore, load_geocodes
+from .intervals import IntervalIndex
+from .query import AlertIndex, FilterResult
+from .search import SearchIndex, collect_languages
+from .spatial import BBox, SpatialIndex, shape_bbox, simplify_geometry
+from .stats import FetchStats, Hook, RequestStats
+from .store import AlertStore
+from .watch import AlertEvent, Watcher
+
+logger = logging.getLogger(__name__)
+
 # Constants
 NAMESPACE_CAP = "urn:oasis:names:tc:emergency:cap:1.2"
 NAMESPACE_ATOM = "http://www.w3.org/2005/Atom"
 
+# Placeholder for alert fields that are only known after loading the CAP document
+DEFERRED = object()
+
+_CAP_IDENTIFIER = f"{{{NAMESPACE_CAP}}}identifier"
+_CAP_SENDER = f"{{{NAMESPACE_CAP}}}sender"
+_CAP_SENT = f"{{{NAMESPACE_CAP}}}sent"
+_CAP_MSG_TYPE = f"{{{NAMESPACE_CAP}}}msgType"
+_CAP_REFERENCES = f"{{{NAMESPACE_CAP}}}references"
+_CAP_INFO = f"{{{NAMESPACE_CAP}}}info"
+_CAP_PARAMETER = f"{{{NAMESPACE_CAP}}}parameter"
+_CAP_VALUE_NAME = f"{{{NAMESPACE_CAP}}}valueName"
+_CAP_VALUE = f"{{{NAMESPACE_CAP}}}value"
+_CAP_AREA = f"{{{NAMESPACE_CAP}}}area"
+_CAP_AREA_DESC = f"{{{NAMESPACE_CAP}}}areaDesc"
+_CAP_POLYGON = f"{{{NAMESPACE_CAP}}}polygon"
+_CAP_GEOCODE = f"{{{NAMESPACE_CAP}}}geocode"
+_ATOM_ENTRY = f"{{{NAMESPACE_ATOM}}}entry"
+
+# Maximum number of CAP documents sent to a parser process at once
+_PARSE_BATCH_SIZE = 64
+
+# Log messages and levels for failures by fetch stage; a deadline is reported
+# once per fetch, see _finish_stats
+_ERROR_MESSAGES = {
+    'feed': ("Error fetching warnings for %s: %s", logging.ERROR),
+    'download': ("Error processing entry for %s: %s", logging.ERROR),
+    'parse': ("Error parsing warning for %s: %s", logging.ERROR),
+    'deadline': ("Skipped request for %s: %s", logging.DEBUG),
+    'circuit': ("Skipped request for %s: %s", logging.WARNING),
+}
+
+# Single-valued <info> children by tag
+_INFO_FIELDS = {f"{{{NAMESPACE_CAP}}}{name}": name for name in (
+    'language', 'category', 'event', 'urgency', 'severity', 'certainty', 'onset', 'effective',
+    'expires', 'senderName', 'headline', 'description', 'web', 'contact'
+)}
+
+try:
+    from lxml import etree as lxml_etree
+    _LXML_PARSER = lxml_etree.XMLParser(resolve_entities=False, no_network=True)
+except ImportError:
+    lxml_etree = None
+
+
+def _parse_xml(content):
+    """Parse an XML document with lxml if it is installed, otherwise with ElementTree."""
+    if lxml_etree is not None:
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return lxml_etree.fromstring(content, _LXML_PARSER)
+    return ET.fromstring(content)
+
+
+def _polygons_geometry(polygons: List[str]) -> Union[array, str, None]:
+    """
+    Build the geometry of CAP polygons: one polygon of 2D points as packed
+    doubles, otherwise a GeoJSON Polygon or MultiPolygon string.
+    CAP points are "lat,lon", GeoJSON positions (lon, lat).
+    """
+    rings = []
+    for polygon in polygons:
+        ring = []
+        for point in polygon.split():
+            position = [float(coord) for coord in point.split(',')]
+            position[:2] = position[1::-1]
+            ring.append(position)
+        rings.append(ring)
+    if not rings:
+        return None
+    if len(rings) > 1:
+        return json.dumps({"type": "MultiPolygon", "coordinates": [[ring] for ring in rings]})
+    if all(len(point) == 2 for point in rings[0]):
+        return array('d', [coord for point in rings[0] for coord in point])
+    return json.dumps({"type": "Polygon", "coordinates": rings})
+
+
+def _geometry_polygons(geometry: Optional[str]) -> list:
+    """Return the polygon coordinates of a GeoJSON Polygon or MultiPolygon string."""
+    if geometry is None:
+        return []
+    data = json.loads(geometry)
+    return [data['coordinates']] if data['type'] == 'Polygon' else list(data['coordinates'])
+
 
-@dataclass
+def _parse_datetime(dt_str: Optional[str]) -> Optional[datetime]:
+    """Parse datetime string to datetime object with proper error handling."""
+    if not dt_str:
+        return None
+    try:
+        dt = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
+        return dt.astimezone(pytz.UTC)
+    except (ValueError, AttributeError):
+        return None
+
+
+@lru_cache(maxsize=None)
+def _load_url_table() -> Dict[str, str]:
+    """Read the country URL table from the package assets."""
+    with resources.as_file(resources.files('meteoalarm.assets').joinpath('MeteoAlarm_urls.yaml')) as path:
+        with open(path, 'r') as file:
+            return yaml.safe_load(file)
+
+
+# Alert fields holding values from small enumerations, and dict fields whose keys
+# and values repeat across warnings; their strings are interned
+_INTERNED_FIELDS = ('category', 'urgency', 'severity', 'certainty', 'awareness_level', 'awareness_type', 'country',
+                    'msg_type')
+_INTERNED_DICT_FIELDS = ('sender', 'area', 'event', 'headline', 'description')
+_DATETIME_FIELDS = ('onset', 'effective', 'expires', 'sent')
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+@dataclass(eq=False, init=False, repr=False)
 class Alert:
+    __slots__ = ('identifier', 'category', 'event', 'urgency', 'severity', 'certainty', 'onset',
+                 'effective', 'expires', 'sender', 'headline', 'description', 'awareness_level',
+                 'awareness_type', 'area', 'country', 'msg_type', 'references', 'sent', 'areas', '_shape',
+                 '_bbox')
+
     identifier: str
     category: str
     event: Dict[str, str]
@@ -33,7 +179,113 @@ class Alert:
     awareness_type: str
     area: Dict[str, str]
     country: str
-    geometry: Optional[str] = None
+    # Stored in _shape: a CAP polygon as packed (lon, lat) doubles, or a GeoJSON string
+    geometry: InitVar[Union[str, array, None]] = None
+    # CAP message type: Alert, Update or Cancel
+    msg_type: str
+    # Identifiers of the earlier messages an Update or Cancel refers to
+    references: Tuple[str, ...]
+    sent: Optional[datetime]
+    # All areas of the warning; the first one is `area`
+    areas: Tuple[Dict[str, str], ...]
+
+    # Written out, since defaults cannot be class attributes of slotted fields
+    def __init__(self, identifier: str, category: str, event: Dict[str, str], urgency: str, severity: str,
+                 certainty: str, onset: datetime, effective: datetime, expires: datetime, sender: Dict[str, str],
+                 headline: Dict[str, str], description: Dict[str, str], awareness_level: str,
+                 awareness_type: str, area: Dict[str, str], country: str,
+                 geometry: Union[str, array, None] = None, msg_type: str = 'Alert',
+                 references: Tuple[str, ...] = (), sent: Optional[datetime] = None,
+                 areas: Tuple[Dict[str, str], ...] = ()):
+        self.identifier = identifier
+        self.category = category
+        self.event = event
+        self.urgency = urgency
+        self.severity = severity
+        self.certainty = certainty
+        self.onset = onset
+        self.effective = effective
+        self.expires = expires
+        self.sender = sender
+        self.headline = headline
+        self.description = description
+        self.awareness_level = awareness_level
+        self.awareness_type = awareness_type
+        self.area = area
+        self.country = country
+        self.msg_type = msg_type
+        self.references = references
+        self.sent = sent
+        self.areas = areas
+        self.__post_init__(geometry)
+
+    def __post_init__(self, geometry: Union[str, array, None]):
+        self._shape = geometry
+        # Packed polygons are scanned right away; GeoJSON strings on first access
+        self._bbox = shape_bbox(geometry) if type(geometry) is array else None
+        for name in _INTERNED_FIELDS:
+            setattr(self, name, _intern(getattr(self, name)))
+        for name in _INTERNED_DICT_FIELDS:
+            value = getattr(self, name)
+            if type(value) is dict:
+                setattr(self, name, {_intern(key): _intern(item) for key, item in value.items()})
+        if type(self.references) is list:
+            self.references = tuple(self.references)
+        if type(self.areas) in (list, tuple):
+            areas = tuple({_intern(key): _intern(item) for key, item in area.items()} for area in self.areas)
+            if areas and areas[0] == self.area:
+                areas = (self.area,) + areas[1:]
+            self.areas = areas or ((self.area,) if type(self.area) is dict else ())
+
+    def _get_geometry(self) -> Optional[str]:
+        """GeoJSON string of the warning area, serialized on demand for packed polygons."""
+        shape = self._shape
+        if type(shape) is not array:
+            return shape
+        points = [[shape[i], shape[i + 1]] for i in range(0, len(shape), 2)]
+        return json.dumps({
+            "type": "Polygon",
+            "coordinates": [points]
+        })
+
+    def _set_geometry(self, geometry: Union[str, array, None]):
+        self._shape = geometry
+        self._bbox = shape_bbox(geometry) if type(geometry) is array else None
+
+    @property
+    def bbox(self) -> Optional[BBox]:
+        """Bounding box (min_lon, min_lat, max_lon, max_lat) of the warning geometry, or None without one."""
+        bbox = self._bbox
+        if bbox is None:
+            bbox = self._bbox = shape_bbox(self._shape)
+        return bbox
+
+    def geometry_at(self, tolerance: float) -> Optional[str]:
+        """
+        GeoJSON string of the warning area simplified with Douglas-Peucker to
+        within `tolerance` degrees. Simplified geometries are cached per area
+        and tolerance, so use a few fixed levels, e.g. 0.001, 0.01 and 0.1.
+        """
+        if tolerance < 0:
+            raise ValueError("tolerance must not be negative")
+        geometry = self.geometry
+        if geometry is None or tolerance == 0:
+            return geometry
+        return simplify_geometry(geometry, tolerance)
+
+    def __repr__(self) -> str:
+        # Written out, since the generated one leaves out the init-only geometry
+        values = ', '.join(f"{name}={getattr(self, name)!r}" for name in ALERT_FIELDS)
+        return f"{self.__class__.__qualname__}({values})"
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        if not all(getattr(self, name) == getattr(other, name) for name in ALERT_FIELDS if name != 'geometry'):
+            return False
+        if type(self._shape) is type(other._shape):
+            return self._shape == other._shape
+        return self.geometry == other.geometry
 
     def get_available_languages(self) -> List[str]:
         """Get list of available languages for this warning."""
@@ -84,6 +336,27 @@ class Alert:
                 f"Severity: {self.severity}\n"
                 f"Valid until: {self.expires}")
 
+    def to_dict(self) -> dict:
+        """Return the fields of the warning as a JSON-serializable dictionary."""
+        data = {name: getattr(self, name) for name in ALERT_FIELDS}
+        for name in _DATETIME_FIELDS:
+            if data[name] is not None:
+                data[name] = data[name].isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Alert':
+        """Create a warning from a dictionary produced by to_dict()."""
+        data = dict(data)
+        for name in _DATETIME_FIELDS:
+            if data.get(name) is not None:
+                data[name] = datetime.fromisoformat(data[name])
+        return cls(**data)
+
+    def __reduce__(self):
+        # Pickled as constructor arguments, so that strings are interned again on loading
+        return Alert, tuple(self._shape if name == 'geometry' else getattr(self, name) for name in ALERT_FIELDS)
+
     def matches_filter(self, **kwargs) -> bool:
         """Check if warning matches all filter criteria."""
         for key, value in kwargs.items():
@@ -97,7 +370,7 @@ class Alert:
                 if not any(value.lower() in v.lower() for v in getattr(self, key).values()):
                     return False
             # Handle datetime attributes
-            elif key in ['onset', 'effective', 'expires'] and isinstance(value, (datetime, str)):
+            elif key in _DATETIME_FIELDS and isinstance(value, (datetime, str)):
                 if isinstance(value, str):
                     try:
                         value = datetime.fromisoformat(value.replace('Z', '+00:00'))
@@ -118,29 +391,343 @@ class Alert:
         return True
 
 
+# The geometry is an init-only variable backed by the packed _shape slot
+Alert.geometry = property(Alert._get_geometry, Alert._set_geometry)
+
+# Public fields of an Alert, in constructor order
+ALERT_FIELDS = tuple(inspect.signature(Alert).parameters)
+
+
+class FeedAlert(Alert):
+    """
+    Alert built from an Atom feed entry.
+    Fields the entry does not carry (descriptions, headlines, parameters,
+    geometry, ...) are loaded from the CAP document the first time any of
+    them is accessed, and then kept.
+    """
+    __slots__ = ('_loader',)
+
+    def __init__(self, loader: Callable[[], Optional[Alert]], **kwargs):
+        # Deferred fields are not loaded while the fields are being initialized
+        self._loader = None
+        super().__init__(**kwargs)
+        self._loader = loader
+
+    def __getattribute__(self, name):
+        value = object.__getattribute__(self, name)
+        if value is DEFERRED and object.__getattribute__(self, '_loader') is not None:
+            object.__getattribute__(self, '_load_details')()
+            value = object.__getattribute__(self, name)
+        return value
+
+    def _load_details(self):
+        """Fill all deferred fields from the CAP document, or with empty values if it fails."""
+        details = self._loader()
+        for name in ALERT_FIELDS:
+            if object.__getattribute__(self, '_shape' if name == 'geometry' else name) is not DEFERRED:
+                continue
+            if name == 'geometry':
+                self._shape = details._shape if details is not None else None
+            elif details is not None:
+                setattr(self, name, getattr(details, name))
+            elif name in _INTERNED_DICT_FIELDS:
+                setattr(self, name, {})
+            elif name in _DATETIME_FIELDS:
+                setattr(self, name, None)
+            elif name in ('references', 'areas'):
+                setattr(self, name, ())
+            elif name == 'msg_type':
+                setattr(self, name, 'Alert')
+            else:
+                setattr(self, name, '')
+
+
+class CapParser:
+    """
+    Single-pass parser of CAP documents into Alerts, shared by MeteoAlarm and
+    its worker processes. It needs neither geocodes nor HTTP: the geometry of
+    a parsed warning holds its CAP polygons, and the areas without one are
+    returned as EMMA_IDs for the caller to look up.
+    """
+
+    def __init__(self, languages: Optional[Set[str]] = None,
+                 on_error: Optional[Callable[[str, Exception], None]] = None):
+        """
+        Parse only the texts in `languages` (full codes or primary subtags), or
+        all if None. `on_error(country, error)` is called for every document
+        that fails to parse.
+        """
+        self.languages = languages
+        self.on_error = on_error or (lambda country, error: None)
+
+    def _wants_language(self, lang: str) -> bool:
+        """Check a CAP language code against the requested languages, by full code or primary subtag."""
+        return self.languages is None or lang in self.languages or lang.split('-')[0] in self.languages
+
+    def _scan_info(self, info, first: bool) -> Optional[Dict[str, object]]:
+        """
+        Collect the fields of an <info> block in a single walk over its children.
+        Only the first occurrence of each field counts. Unless this is the first
+        block, the walk stops at the language if it was not requested, and
+        parameters and areas are skipped.
+        """
+        values = {}
+        for child in info:
+            name = _INFO_FIELDS.get(child.tag)
+            if name is not None:
+                if name not in values:
+                    values[name] = child.text if child.text is not None else ''
+                    if name == 'language' and not first and not self._wants_language(values[name]):
+                        return None
+            elif not first:
+                continue
+            elif child.tag == _CAP_PARAMETER:
+                value_name = value = None
+                for part in child:
+                    if part.tag == _CAP_VALUE_NAME and value_name is None:
+                        value_name = part
+                    elif part.tag == _CAP_VALUE and value is None:
+                        value = part
+                if value_name is not None and value is not None:
+                    values.setdefault(('parameter', value_name.text), value.text)
+            elif child.tag == _CAP_AREA:
+                self._scan_area(child, values)
+        return values
+
+    def _scan_area(self, area, values: Dict[str, object]):
+        """
+        Collect the areaDesc and EMMA_ID of an <area> into the areas, the
+        first of which is the main area, and its polygons into the polygons
+        of the areas, in the same order.
+        """
+        fields = {}
+        polygons = []
+        for child in area:
+            if child.tag == _CAP_POLYGON:
+                if child.text and child.text.strip():
+                    polygons.append(child.text)
+            elif child.tag == _CAP_AREA_DESC:
+                fields.setdefault('areaDesc', child.text or '')
+            elif child.tag == _CAP_GEOCODE and 'EMMA_ID' not in fields:
+                value = next((part for part in child if part.tag == _CAP_VALUE), None)
+                fields['EMMA_ID'] = (value.text or '') if value is not None else ''
+        fields.setdefault('areaDesc', '')
+        values.setdefault('area', fields)
+        values.setdefault('areas', []).append(fields)
+        values.setdefault('polygons', []).append(polygons)
+
+    def parse(self, xml_content: str, country: str) -> Optional[Tuple[Alert, Tuple[str, ...]]]:
+        """
+        Parse individual warning XML and create Alert object, with the CAP
+        polygons of its areas as geometry. Return it with the EMMA_IDs of the
+        areas without a polygon, whose geometries come from the geocodes.
+        The document is walked once, dispatching on tags; uses lxml when installed.
+        """
+        try:
+            root = _parse_xml(xml_content)
+
+            identifier = sender_id = sent = msg_type = None
+            references = ()
+            first_info = None
+            descriptions = {}
+            headlines = {}
+            event_detail = {}
+            for child in root:
+                if child.tag == _CAP_IDENTIFIER and identifier is None:
+                    identifier = child.text or ''
+                elif child.tag == _CAP_SENDER and sender_id is None:
+                    sender_id = child.text or ''
+                elif child.tag == _CAP_SENT and sent is None:
+                    sent = child.text
+                elif child.tag == _CAP_MSG_TYPE and msg_type is None:
+                    msg_type = child.text
+                elif child.tag == _CAP_REFERENCES and not references:
+                    # Whitespace-separated sender,identifier,sent triples
+                    references = tuple(reference.split(',')[1] for reference in (child.text or '').split()
+                                       if reference.count(',') == 2)
+                elif child.tag == _CAP_INFO:
+                    info = self._scan_info(child, first=first_info is None)
+                    if info is None:
+                        continue
+                    if first_info is None:
+                        first_info = info
+                    lang = info.get('language', '')
+                    if lang and self._wants_language(lang):
+                        # Get descriptions, headlines and events in different languages
+                        if info.get('description'):
+                            descriptions[lang] = info['description']
+                        if info.get('headline'):
+                            headlines[lang] = info['headline']
+                        if info.get('event'):
+                            event_detail[lang] = info['event']
+
+            if first_info is None:
+                return None
+
+            # Get sender information
+            sender = {
+                'sender': sender_id or '',
+                'senderName': first_info.get('senderName', ''),
+                'contact': first_info.get('contact', ''),
+                'web': first_info.get('web', '')
+            }
+            area = first_info.get('area', {})
+
+            areas = first_info.get('areas', ())
+            polygons = first_info.get('polygons', ())
+            geometry = _polygons_geometry([polygon for area_polygons in polygons for polygon in area_polygons])
+            codes = tuple(fields.get('EMMA_ID') for fields, area_polygons in zip(areas, polygons)
+                          if not area_polygons)
+
+            def get_parameter(name: str) -> str:
+                value = first_info.get(('parameter', name))
+                return value.split(';')[0].strip() if value is not None else ''
+
+            warning = Alert(
+                identifier=identifier or '',
+                category=first_info.get('category', ''),
+                event=event_detail,
+                urgency=first_info.get('urgency', ''),
+                severity=first_info.get('severity', ''),
+                certainty=first_info.get('certainty', ''),
+                onset=_parse_datetime(first_info.get('onset')),
+                effective=_parse_datetime(first_info.get('effective')),
+                expires=_parse_datetime(first_info.get('expires')),
+                sender=sender,
+                headline=headlines,
+                description=descriptions,
+                awareness_level=get_parameter('awareness_level'),
+                awareness_type=get_parameter('awareness_type'),
+                area=area,
+                country=country,
+                msg_type=(msg_type or 'Alert').strip(),
+                references=references,
+                sent=_parse_datetime(sent),
+                areas=areas,
+                geometry=geometry
+            )
+            return warning, codes
+        except Exception as e:
+            self.on_error(country, e)
+            return None
+
+
 class MeteoAlarm:
-    def __init__(self, countries: List[str]):
-        """Initialize and fetch weather warnings for specified countries."""
+    def __init__(self, countries: List[str], max_workers: int = 8, max_per_host: int = 4,
+                 lazy: bool = False, cache: Union[str, AlertCache, None] = None, stream: bool = False,
+                 languages: Optional[List[str]] = None, hook: Optional[Hook] = None,
+                 processes: Optional[int] = None, timeout: Union[float, Tuple[float, float]] = (5.0, 30.0),
+                 retries: int = 2, backoff: float = 0.5, deadline: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None, server: Optional[str] = None):
+        """
+        Initialize and fetch weather warnings for specified countries.
+        Feeds and warnings are downloaded in parallel with up to `max_workers`
+        requests at once, and at most `max_per_host` against the same host.
+        With `lazy`, warnings are built from the Atom feeds alone (one request
+        per country) and each CAP document is only fetched once a field that
+        needs it is accessed.
+        With `cache`, a path or an AlertCache, parsed warnings are kept on disk
+        and only CAP documents missing from it are downloaded.
+        With `stream`, nothing is fetched up front; iterating the object
+        streams the warnings with iter_warnings() instead.
+        With `languages`, e.g. ["en", "de-DE"], only texts in those languages
+        (full code or primary subtag) are parsed; other <info> blocks are skipped.
+        After each fetch, `stats` holds its timings, sizes, alert counts and
+        errors per country and request; `hook(event, attributes)` is called
+        for every request, error and completed fetch, see FetchStats.
+        With `processes`, downloaded CAP documents are parsed in batches by a
+        pool of that many worker processes instead of on the download threads.
+        Requests time out after `timeout` seconds ((connect, read) or both),
+        and transient failures are retried `retries` times with exponential
+        backoff from `backoff` seconds. With `deadline`, a fetch gives up after
+        that many seconds and keeps what it has; `stats.incomplete` lists the
+        countries that could not be fetched completely. A `breaker` stops
+        requesting a country after repeated failures (by default after 3, for
+        5 minutes).
+        With `server`, the URL of a `python -m meteoalarm serve` instance, the
+        warnings are loaded from its snapshot instead of the MeteoAlarm feeds,
+        one conditional request per country.
+        """
+        self._configure(countries, max_workers, max_per_host, lazy, cache, languages, hook, processes,
+                        timeout, retries, backoff, deadline, breaker, server)
+        self.stream = stream
+        self._set_warnings([] if stream else self._get_all_warnings(self.countries))
+
+    def _configure(self, countries: List[str], max_workers: int, max_per_host: int, lazy: bool,
+                   cache: Union[str, AlertCache, None], languages: Optional[List[str]],
+                   hook: Optional[Hook] = None, processes: Optional[int] = None,
+                   timeout: Union[float, Tuple[float, float]] = (5.0, 30.0), retries: int = 2, backoff: float = 0.5,
+                   deadline: Optional[float] = None, breaker: Optional[CircuitBreaker] = None,
+                   server: Optional[str] = None):
+        """Validate the countries and set up configuration and HTTP fetcher."""
         if countries is None:
             raise ValueError("Countries list cannot be None")
         if not isinstance(countries, list):
             raise ValueError("Countries must be provided as a list")
         if not countries:
             raise ValueError("No countries provided")
+        if processes is not None and processes < 1:
+            raise ValueError("processes must be at least 1")
+        if deadline is not None and deadline <= 0:
+            raise ValueError("deadline must be positive")
+        if server is not None and lazy:
+            raise ValueError("Lazy loading is not available with a server")
 
-        """Initialize and fetch weather warnings for specified countries."""
         self.country_urls = self._load_urls()
         self.geocodes = self._load_geocodes()
+        self._fetcher = Fetcher(max_workers=max_workers, max_per_host=max_per_host,
+                                timeout=timeout, retries=retries, backoff=backoff)
 
         # Check all countries before proceeding
         for country in countries:
             if country.lower() not in self.country_urls:
                 raise ValueError(f"No URL configuration found for country: {country}")
 
-        self._warnings = self._get_all_warnings(countries)
+        self.countries = countries
+        self.lazy = lazy
+        self.stream = False
+        self.languages = set(languages) if languages is not None else None
+        self._parser = CapParser(self.languages, self._parse_failed)
+        self.cache = AlertCache(cache) if isinstance(cache, str) else cache
+        self.hook = hook
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.server = server.rstrip('/') if server is not None else None
+        # time.monotonic() by which the running fetch has to end
+        self._deadline: Optional[float] = None
+        self.processes = processes
+        # Pool of CAP parser processes, started on first use and shut down with
+        # the instance if close() is never called
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
+        self._parse_pool_finalizer: Optional[weakref.finalize] = None
+        # Metrics of the last fetch; later lazy loads are added to it
+        self.stats = FetchStats(hook)
+        # Indexes over the current warnings, built on first use
+        self._indexes = {}
+        # Validators of the last Atom response per country, CAP links listed in the
+        # last successful feed per country, and parsed warnings by (country, CAP link).
+        self._feed_validators: Dict[str, Dict[str, str]] = {}
+        self._feed_entries: Dict[str, List[Tuple[str, str]]] = {}
+        self._cap_cache: Dict[Tuple[str, str], Tuple[str, Alert]] = {}
+        # Parsed warnings to store in the AlertCache at the end of the fetch
+        self._cache_writes: List[Tuple[str, str, str, dict, Optional[datetime]]] = []
+
+    def _set_warnings(self, warnings: List[Alert]):
+        """Replace the current snapshot of warnings and drop the indexes built over it."""
+        self._warnings = warnings
+        self._indexes = {}
+
+    def _get_index(self, name: str, build: Callable[[List[Alert]], object]):
+        """Return the named index over the current warnings, building it on first use."""
+        index = self._indexes.get(name)
+        if index is None:
+            index = self._indexes[name] = build(self._warnings)
+        return index
 
     def __iter__(self):
         """Make the MeteoAlarm object directly iterable."""
+        if self.stream:
+            return self.iter_warnings()
         return iter(self._warnings)
 
     def __len__(self):
@@ -156,200 +743,683 @@ class MeteoAlarm:
         return self._warnings
 
     def _load_urls(self) -> Dict[str, str]:
-        """Load country URLs from YAML file."""
+        """Load country URLs from YAML file, once per process."""
         try:
-            with resources.files('meteoalarm.assets').joinpath('MeteoAlarm_urls.yaml').open('r') as file:
-                return yaml.safe_load(file)
+            return _load_url_table()
         except Exception as e:
             raise FileNotFoundError(f"Error loading country URLs configuration: {str(e)}")
 
-    def _load_geocodes(self) -> Dict[str, str]:
-        """Load geocodes from JSON file."""
+    def _load_geocodes(self) -> GeocodeStore:
+        """Load the geocode store, shared by all instances in the process."""
         try:
-            with resources.files('meteoalarm.assets').joinpath('geocodes.json').open('r') as file:
-                data = json.load(file)
-                geocodes = {}
-                for feature in data['features']:
-                    if feature['properties']['type'] == 'EMMA_ID':
-                        emma_id = feature['properties']['code']
-                        geometry = json.dumps(feature['geometry'])
-                        geocodes[emma_id] = geometry
-                return geocodes
+            return load_geocodes()
         except Exception as e:
             raise FileNotFoundError(f"Error loading geocodes: {str(e)}")
 
-    def _parse_datetime(self, dt_str: Optional[str]) -> Optional[datetime]:
-        """Parse datetime string to datetime object with proper error handling."""
-        if not dt_str:
+    def _report_error(self, stage: str, country: str, url: Optional[str], error: Exception):
+        """Log a failed fetch step and count it in the stats."""
+        message, level = _ERROR_MESSAGES[stage]
+        logger.log(level, message, country, error)
+        self.stats.record_error(stage, country, url, error)
+
+    def _request_failed(self, stage: str, country: str, url: str, error: Exception):
+        """Report a failed request; transient failures count against the circuit of the country."""
+        if isinstance(error, DeadlineExceeded):
+            stage = 'deadline'
+        elif isinstance(error, CircuitOpen):
+            stage = 'circuit'
+        elif is_transient(error):
+            self.breaker.failure(country)
+        self._report_error(stage, country, url, error)
+
+    def _request(self, country: str, url: str, **kwargs) -> requests.Response:
+        """GET url for a country within the deadline of the running fetch, unless its circuit is open."""
+        if not self.breaker.allow(country):
+            raise CircuitOpen(f"Circuit open after repeated failures for {country}")
+        response = self._fetcher.get(url, deadline=self._deadline, **kwargs)
+        self.breaker.success(country)
+        return response
+
+    def _start_stats(self):
+        """Start the stats and the deadline of a fetch."""
+        self.stats = FetchStats(self.hook)
+        self._deadline = time.monotonic() + self.deadline if self.deadline is not None else None
+
+    def _finish_stats(self, warnings: Iterable[Alert]):
+        """Count the fetched warnings, end the deadline and complete the stats of a fetch."""
+        self._deadline = None
+        self.stats.count_alerts(warnings)
+        self.stats.finish()
+        if self.stats.errors['deadline']:
+            logger.warning("Fetch deadline of %ss exceeded, incomplete countries: %s",
+                           self.deadline, ', '.join(self.stats.incomplete))
+
+    def _record_request(self, country: str, kind: str, url: str, response: requests.Response,
+                        duration: float, size: int, parse_time: float = 0.0):
+        """Add the timing and size of a completed request to the stats."""
+        self.stats.record_request(RequestStats(
+            country=country, kind=kind, url=url, status=response.status_code,
+            elapsed=response.elapsed.total_seconds(), duration=duration, bytes=size, parse_time=parse_time
+        ))
+
+    def _parse_warning_xml(self, xml_content: str, country: str) -> Optional[Alert]:
+        """Parse individual warning XML and create Alert object with the geometry of all its areas."""
+        parsed = self._parser.parse(xml_content, country)
+        return self._attach_geometry(*parsed) if parsed is not None else None
+
+    def _parse_failed(self, country: str, error: Exception):
+        """Report a CAP document of a country that failed to parse."""
+        self._report_error('parse', country, None, error)
+
+    def _get_feed_entries(self, country: str,
+                          conditional: bool = False) -> Optional[List[Tuple[str, str, ET.Element]]]:
+        """
+        Get the (CAP link, version, entry element) triples listed in the Atom feed of a country.
+        With `conditional`, the request carries the validators of the previous
+        response and None is returned if the feed has not changed since.
+        """
+        url = self.country_urls.get(country.lower())
+        if not url:
+            raise ValueError(f"No URL configuration found for country: {country}")
+
+        headers = {}
+        validators = self._feed_validators.get(country, {}) if conditional else {}
+        if 'ETag' in validators:
+            headers['If-None-Match'] = validators['ETag']
+        if 'Last-Modified' in validators:
+            headers['If-Modified-Since'] = validators['Last-Modified']
+
+        start = time.perf_counter()
+        response = self._request(country, url, headers=headers)
+        duration = time.perf_counter() - start
+        if response.status_code == 304:
+            self._record_request(country, 'feed', url, response, duration, 0)
             return None
+
+        start = time.perf_counter()
+        root = ET.fromstring(response.content)
+        # Only a feed that parsed may be skipped as unchanged next time
+        self._feed_validators[country] = {
+            key: response.headers[key] for key in ('ETag', 'Last-Modified') if key in response.headers
+        }
+        entries = []
+        for entry in root.findall(f".//{_ATOM_ENTRY}"):
+            link = self._get_entry_link(entry)
+            if link:
+                entries.append((link, self._get_entry_version(entry), entry))
+        self._record_request(country, 'feed', url, response, duration, len(response.content),
+                             time.perf_counter() - start)
+        return entries
+
+    def _get_entry_link(self, entry: ET.Element) -> Optional[str]:
+        """Get the CAP link of an Atom entry."""
+        warning_link = entry.find(f".//{{{NAMESPACE_ATOM}}}link[@type='application/cap+xml']")
+        return warning_link.get('href') if warning_link is not None else None
+
+    def _get_entry_version(self, entry: ET.Element) -> str:
+        """Get the version of an Atom entry; a changed entry keeps its link but gets a new update or sent time."""
+        version = entry.find(f"{{{NAMESPACE_ATOM}}}updated")
+        if version is None:
+            version = entry.find(f"{{{NAMESPACE_CAP}}}sent")
+        return version.text if version is not None and version.text else ''
+
+    def _get_feed_jobs(self, country: str, conditional: bool = False) -> List[Tuple[str, str, str]]:
+        """
+        Get (country, url, version) download jobs for the CAP documents of a country
+        that are not cached yet. If the feed fails, its previous entries are kept
+        and no jobs are returned; if it is unchanged, the documents of its entries
+        that failed or were skipped last time are retried. With a server, the warnings
+        of the country are loaded from it instead, and there are no jobs.
+        """
+        if self.server is not None:
+            self._get_server_warnings(country, conditional)
+            return []
         try:
-            dt = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
-            return dt.astimezone(pytz.UTC)
-        except (ValueError, AttributeError):
-            return None
+            entries = self._get_feed_entries(country, conditional)
+        except Exception as e:
+            self._request_failed('feed', country, self.country_urls.get(country.lower()), e)
+            return []
+        if entries is None:
+            return [(country, link, version) for link, version in self._feed_entries.get(country, [])
+                    if self._cap_cache.get((country, link), (None,))[0] != version]
+
+        self._feed_entries[country] = [(link, version) for link, version, _ in entries]
+        stored = {}
+        if self.cache is not None and not self.lazy:
+            try:
+                self.cache.retain(country, [link for link, _, _ in entries])
+                stored = self.cache.load(country, [(link, self._cache_version(version))
+                                                   for link, version in self._feed_entries[country]])
+            except Exception as e:
+                logger.warning("Ignoring the warning cache for %s: %s", country, e)
 
-    def _get_parameter_value(self, info: ET.Element, param_name: str, default: str = '') -> str:
-        """Extract parameter value from info element with proper error handling."""
+        jobs = []
+        for link, version, entry in entries:
+            cached = self._cap_cache.get((country, link))
+            if cached is not None and cached[0] == version:
+                continue
+            restored = self._restore_cached(country, link, stored[link]) if link in stored else None
+            if restored is not None:
+                self._cap_cache[(country, link)] = (version, restored)
+            elif self.lazy:
+                self._cap_cache[(country, link)] = (version, self._parse_feed_entry(entry, country, link))
+            else:
+                jobs.append((country, link, version))
+        return jobs
+
+    def _get_server_warnings(self, country: str, conditional: bool = False):
+        """
+        Load the warnings of a country from the snapshot of a server, see
+        SnapshotServer. They take the place of the feed entries and parsed CAP
+        documents: each warning is listed by identifier (or, without one, by
+        its hash), with its serialized form hashed as version, so unchanged
+        warnings keep their Alert objects.
+        """
+        url = f"{self.server}/warnings?country__in={country.lower()}&compact=1"
         try:
-            for param in info.findall(f".//{{{NAMESPACE_CAP}}}parameter"):
-                name = param.find(f"{{{NAMESPACE_CAP}}}valueName")
-                value = param.find(f"{{{NAMESPACE_CAP}}}value")
-                if name is not None and value is not None and name.text == param_name:
-                    return value.text.split(';')[0].strip()
-            return default
-        except (AttributeError, IndexError):
-            return default
+            headers = {}
+            validators = self._feed_validators.get(country, {}) if conditional else {}
+            if 'ETag' in validators:
+                headers['If-None-Match'] = validators['ETag']
+            start = time.perf_counter()
+            response = self._request(country, url, headers=headers)
+            duration = time.perf_counter() - start
+            if response.status_code == 304:
+                self._record_request(country, 'feed', url, response, duration, 0)
+                return
+            start = time.perf_counter()
+            entries = []
+            listed = set()
+            for position, data in enumerate(json.loads(response.content)):
+                version = hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+                # Warnings without an identifier are listed by their content, and position if repeated
+                link = data['identifier'] or version
+                if link in listed:
+                    link = f"{link}#{position}"
+                listed.add(link)
+                key = (country, link)
+                cached = self._cap_cache.get(key)
+                if cached is None or cached[0] != version:
+                    self._cap_cache[key] = (version, self._restore_alert(data))
+                entries.append((link, version))
+            self._feed_entries[country] = entries
+            self._feed_validators[country] = {'ETag': response.headers['ETag']} if 'ETag' in response.headers else {}
+            self._record_request(country, 'feed', url, response, duration, len(response.content),
+                                 time.perf_counter() - start)
+        except Exception as e:
+            self._request_failed('feed', country, url, e)
 
-    def _parse_warning_xml(self, xml_content: str, country: str) -> Optional[Alert]:
-        """Parse individual warning XML and create Alert object."""
+    def _parse_feed_entry(self, entry: ET.Element, country: str, link: str) -> FeedAlert:
+        """Create a FeedAlert from the CAP fields of an Atom entry, deferring all others."""
+        def get_text(name: str) -> Optional[str]:
+            elem = entry.find(f"{{{NAMESPACE_CAP}}}{name}")
+            return elem.text if elem is not None and elem.text else None
+
+        alert_fields = {name: DEFERRED for name in ALERT_FIELDS}
+        for name in ('identifier', 'urgency', 'severity', 'certainty'):
+            if get_text(name) is not None:
+                alert_fields[name] = get_text(name)
+        for name in _DATETIME_FIELDS:
+            if get_text(name) is not None:
+                alert_fields[name] = _parse_datetime(get_text(name))
+        if get_text('message_type') is not None:
+            alert_fields['msg_type'] = get_text('message_type').strip()
+
+        area_desc = get_text('areaDesc')
+        if area_desc is not None:
+            area = {'areaDesc': area_desc}
+            geocode = entry.find(f"{{{NAMESPACE_CAP}}}geocode")
+            if geocode is not None:
+                # The geocode children are not consistently namespaced in the feeds
+                values = {child.tag.split('}')[-1]: child.text for child in geocode}
+                if values.get('valueName') == 'EMMA_ID':
+                    area['EMMA_ID'] = values.get('value') or ''
+            alert_fields['area'] = area
+        alert_fields['country'] = country
+
+        return FeedAlert(partial(self._download_warning, country, link), **alert_fields)
+
+    def _download_document(self, country: str, warning_url: str) -> Optional[Tuple[requests.Response, float]]:
+        """Download a single CAP document; return the response and the download time, or None on failure."""
         try:
-            root = ET.fromstring(xml_content)
-            first_info = root.find(f".//{{{NAMESPACE_CAP}}}info")
+            start = time.perf_counter()
+            warning_response = self._request(country, warning_url)
+            return warning_response, time.perf_counter() - start
+        except Exception as e:
+            self._request_failed('download', country, warning_url, e)
+            return None
 
-            if first_info is None:
-                return None
+    def _download_warning(self, country: str, warning_url: str) -> Optional[Alert]:
+        """Download and parse a single CAP document."""
+        download = self._download_document(country, warning_url)
+        if download is None:
+            return None
+        warning_response, duration = download
+        start = time.perf_counter()
+        warning = self._parse_warning_xml(warning_response.content, country)
+        self._record_request(country, 'cap', warning_url, warning_response, duration,
+                             len(warning_response.content), time.perf_counter() - start)
+        return warning
 
-            # Helper function to safely get text from XML element
-            def safe_get_text(element: Optional[ET.Element], xpath: str, default: str = '') -> str:
-                try:
-                    elem = element.find(xpath) if element is not None else None
-                    return elem.text if elem is not None and elem.text is not None else default
-                except (AttributeError, TypeError):
-                    return default
+    def _store_warning(self, job: Tuple[str, str, str], warning: Alert):
+        """Cache a parsed warning for its (country, url, version) job."""
+        country, warning_url, version = job
+        self._cap_cache[(country, warning_url)] = (version, warning)
+        if self.cache is not None:
+            self._cache_writes.append((country, warning_url, self._cache_version(version),
+                                       self._dump_alert(warning), warning.expires))
 
-            # Get descriptions and headlines in different languages
-            descriptions = {}
-            headlines = {}
-            event_detail = {}
-            polygon = None
-            for info in root.findall(f".//{{{NAMESPACE_CAP}}}info"):
-                lang = safe_get_text(info, f".//{{{NAMESPACE_CAP}}}language")
-                if lang:
-                    desc = safe_get_text(info, f".//{{{NAMESPACE_CAP}}}description")
-                    headline = safe_get_text(info, f".//{{{NAMESPACE_CAP}}}headline")
-                    event = safe_get_text(info, f".//{{{NAMESPACE_CAP}}}event")
-                    if desc:
-                        descriptions[lang] = desc
-                    if headline:
-                        headlines[lang] = headline
-                    if event:
-                        event_detail[lang] = event
-            
-            # Get sender information
-            sender = {
-                'sender': safe_get_text(root, f".//{{{NAMESPACE_CAP}}}sender"),
-                'senderName': safe_get_text(first_info, f".//{{{NAMESPACE_CAP}}}senderName"),
-                'contact': safe_get_text(first_info, f".//{{{NAMESPACE_CAP}}}contact"),
-                'web': safe_get_text(first_info, f".//{{{NAMESPACE_CAP}}}web")
-            }
+    def _flush_cache(self):
+        """Store the warnings parsed by the fetch in one transaction, then evict stale entries."""
+        writes, self._cache_writes = self._cache_writes, []
+        try:
+            self.cache.store_many(writes)
+            self.cache.evict()
+        except Exception as e:
+            logger.warning("Could not update the warning cache: %s", e)
 
-            # Get area information
-            area = {}
-            area_elem = first_info.find(f".//{{{NAMESPACE_CAP}}}area")
-            if area_elem is not None:
-                area['areaDesc'] = safe_get_text(area_elem, f".//{{{NAMESPACE_CAP}}}areaDesc")
-                geocode = area_elem.find(f".//{{{NAMESPACE_CAP}}}geocode")
-                if geocode is not None:
-                    area['EMMA_ID'] = safe_get_text(geocode, f".//{{{NAMESPACE_CAP}}}value")
-
-            # Get polygon information
-            polygon = safe_get_text(first_info, f".//{{{NAMESPACE_CAP}}}polygon", None)
-            if polygon:
-                coordinates = [
-                    [float(coord) for coord in point.split(',')]
-                    for point in polygon.split()
-                ]
-                geometry = json.dumps({
-                    "type": "Polygon",
-                    "coordinates": [coordinates]
-                })
-            else:
-                geometry = self.geocodes.get(area.get('EMMA_ID'))
-        
-            # Create Alert object with proper error handling for all fields
-            return Alert(
-                identifier=safe_get_text(root, f".//{{{NAMESPACE_CAP}}}identifier"),
-                category=safe_get_text(first_info, f".//{{{NAMESPACE_CAP}}}category"),
-                event=event_detail,
-                urgency=safe_get_text(first_info, f".//{{{NAMESPACE_CAP}}}urgency"),
-                severity=safe_get_text(first_info, f".//{{{NAMESPACE_CAP}}}severity"),
-                certainty=safe_get_text(first_info, f".//{{{NAMESPACE_CAP}}}certainty"),
-                onset=self._parse_datetime(safe_get_text(first_info, f".//{{{NAMESPACE_CAP}}}onset")),
-                effective=self._parse_datetime(safe_get_text(first_info, f".//{{{NAMESPACE_CAP}}}effective")),
-                expires=self._parse_datetime(safe_get_text(first_info, f".//{{{NAMESPACE_CAP}}}expires")),
-                sender=sender,
-                headline=headlines,
-                description=descriptions,
-                awareness_level=self._get_parameter_value(first_info, "awareness_level"),
-                awareness_type=self._get_parameter_value(first_info, "awareness_type"),
-                area=area,
-                country=country,
-                geometry=geometry
-            )
+    def _cache_version(self, version: str) -> str:
+        """Version of a warning in the shared AlertCache; it names the parsed `languages`, if restricted."""
+        if self.languages is None:
+            return version
+        return f"{version}|{','.join(sorted(self.languages))}"
+
+    def _get_warning(self, job: Tuple[str, str, str]) -> Optional[Alert]:
+        """Download, parse and cache a single CAP document for a (country, url, version) job."""
+        country, warning_url, _ = job
+        warning = self._download_warning(country, warning_url)
+        if warning:
+            self._store_warning(job, warning)
+        return warning
+
+    def _get_parse_pool(self) -> ProcessPoolExecutor:
+        """Return the pool of parser processes, starting it on first use."""
+        if self._parse_pool is None:
+            # Spawned rather than forked, since download threads may be running
+            self._parse_pool = ProcessPoolExecutor(max_workers=self.processes,
+                                                   mp_context=multiprocessing.get_context('spawn'))
+            self._parse_pool_finalizer = weakref.finalize(self, self._parse_pool.shutdown, wait=False)
+        return self._parse_pool
+
+    def _close_parse_pool(self, wait: bool = True):
+        """Shut the pool of parser processes down; the next parse starts a new one."""
+        if self._parse_pool is not None:
+            self._parse_pool_finalizer.detach()
+            self._parse_pool.shutdown(wait=wait)
+            self._parse_pool = self._parse_pool_finalizer = None
+
+    def _get_warnings_in_processes(self, jobs: List[Tuple[str, str, str]]):
+        """
+        Download the CAP documents of the jobs on the download threads and parse
+        them in batches in the process pool while further downloads continue.
+        Workers parse without geocodes; geometries are attached here from the
+        shared store, and the parsed warnings are cached as with _get_warning.
+        """
+        pool = self._get_parse_pool()
+        batch_size = max(1, min(_PARSE_BATCH_SIZE, math.ceil(len(jobs) / self.processes)))
+        downloads = self._fetcher.imap(lambda job: self._download_document(job[0], job[1]), jobs)
+
+        batches = []
+        batch = []
+
+        def submit():
+            documents = [(country, response.content) for (country, _, _), response, _ in batch]
+            try:
+                future = pool.submit(_parse_documents, documents, self.languages)
+            except BrokenProcessPool as e:
+                future = Future()
+                future.set_exception(e)
+            batches.append((batch, future))
+
+        for job, download in zip(jobs, downloads):
+            if download is None:
+                continue
+            batch.append((job, *download))
+            if len(batch) == batch_size:
+                submit()
+                batch = []
+        if batch:
+            submit()
+
+        for batch, future in batches:
+            try:
+                results, errors = future.result()
+            except BrokenProcessPool as e:
+                # A worker died; the batch fails to parse and the pool is started anew next time
+                self._close_parse_pool(wait=False)
+                results = [(None, 0.0)] * len(batch)
+                errors = [(country, e) for (country, _, _), _, _ in batch]
+            for country, error in errors:
+                self._report_error('parse', country, None, error)
+            for (job, response, duration), (parsed, parse_time) in zip(batch, results):
+                country, warning_url, _ = job
+                self._record_request(country, 'cap', warning_url, response, duration,
+                                     len(response.content), parse_time)
+                if parsed:
+                    self._store_warning(job, self._attach_geometry(*parsed))
+
+    def close(self):
+        """Stop the parser processes, if any, and close the pooled HTTP connections."""
+        self._close_parse_pool()
+        self._fetcher.close()
+
+    def __enter__(self) -> 'MeteoAlarm':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _dump_alert(self, alert: Alert) -> dict:
+        """Serialize a warning for the cache, leaving out geometries taken from the geocodes."""
+        data = alert.to_dict()
+        if data['geometry'] is not None and data['geometry'] == self.geocodes.get(alert.area.get('EMMA_ID')):
+            data['geometry'] = None
+        return data
+
+    def _restore_alert(self, data: dict) -> Alert:
+        """Recreate a cached warning, taking a missing geometry from the geocodes."""
+        alert = Alert.from_dict(data)
+        if alert.geometry is not None:
+            return alert
+        return self._attach_geometry(alert, (alert.area.get('EMMA_ID'),))
+
+    def _restore_cached(self, country: str, link: str, data: dict) -> Optional[Alert]:
+        """Restore a warning from the AlertCache; an entry that fails to load is a cache miss."""
+        try:
+            return self._restore_alert(data)
         except Exception as e:
-            print(f"Error parsing warning for {country}: {str(e)}")
+            logger.warning("Ignoring cached warning %s for %s: %s", link, country, e)
             return None
 
+    def _attach_geometry(self, alert: Alert, codes: Iterable[Optional[str]]) -> Alert:
+        """
+        Add the geometries of the geocode areas `codes` to the geometry of a
+        warning. A single area keeps the shared geometry string of the geocodes;
+        several areas, or areas added to CAP polygons, make a MultiPolygon.
+        """
+        codes = [code for code in dict.fromkeys(codes) if self.geocodes.get(code) is not None]
+        if not codes:
+            return alert
+        if alert.geometry is None and len(codes) == 1:
+            alert.geometry = self.geocodes.get(codes[0])
+            # Bounding boxes of the geocode areas are precomputed
+            alert._bbox = self.geocodes.bbox(codes[0])
+            return alert
+        polygons = _geometry_polygons(alert.geometry)
+        for code in codes:
+            polygons.extend(_geometry_polygons(self.geocodes.get(code)))
+        alert.geometry = json.dumps({"type": "MultiPolygon", "coordinates": polygons})
+        return alert
+
+    def _collect_warnings(self, countries: List[str]) -> List[Alert]:
+        """
+        Assemble the cached warnings in the order of the countries and their feed
+        entries, and drop cached documents no longer listed in any feed.
+        """
+        listed = {(country, link) for country, entries in self._feed_entries.items() for link, _ in entries}
+        for key in set(self._cap_cache) - listed:
+            del self._cap_cache[key]
+        if self.cache is not None:
+            self._flush_cache()
+
+        return [warning for country in countries for warning in self._country_warnings(country)]
+
+    def _country_warnings(self, country: str) -> List[Alert]:
+        """
+        Return the current warnings listed in the last feed of a country, in
+        feed order. A changed entry keeps its previous version until the new one
+        has been parsed. Updates replace the warnings they reference and Cancel
+        messages remove them, see AlertStore; lazy warnings are kept as listed,
+        since their references are only known once their document is loaded.
+        """
+        return [warning for _, warning in self._country_entries(country)]
+
+    def _country_entries(self, country: str) -> List[Tuple[str, Alert]]:
+        """Return the (CAP link, warning) pairs behind _country_warnings."""
+        entries = []
+        for link, _ in self._feed_entries.get(country, []):
+            cached = self._cap_cache.get((country, link))
+            if cached is not None:
+                entries.append((link, cached[1]))
+        if self.lazy:
+            return entries
+        current = {id(warning) for warning in AlertStore(warning for _, warning in entries)}
+        return [(link, warning) for link, warning in entries if id(warning) in current]
+
     def _get_warnings_for_country(self, country: str) -> List[Alert]:
         """Get weather warnings for a specific country."""
-        url = self.country_urls.get(country.lower())
-        if not url:
+        if not self.country_urls.get(country.lower()):
             raise ValueError(f"No URL configuration found for country: {country}")
+        return self._get_all_warnings([country])
 
-        try:
-            # Get the Atom feed
-            response = requests.get(url)
-            response.raise_for_status()
-
-            root = ET.fromstring(response.content)
-            warnings = []
-
-            # Process each entry in the feed
-            for entry in root.findall(f".//{{{NAMESPACE_ATOM}}}entry"):
-                try:
-                    warning_link = entry.find(f".//{{{NAMESPACE_ATOM}}}link[@type='application/cap+xml']")
-                    if warning_link is not None:
-                        warning_url = warning_link.get('href')
-                        warning_response = requests.get(warning_url)
-                        warning_response.raise_for_status()
-
-                        warning = self._parse_warning_xml(warning_response.content, country)
-                        if warning:
-                            warnings.append(warning)
-                except Exception as e:
-                    print(f"Error processing entry for {country}: {str(e)}")
-                    continue
-
-            return warnings
-        except Exception as e:
-            print(f"Error fetching warnings for {country}: {str(e)}")
-            return []
+    def _get_all_warnings(self, countries: List[str], conditional: bool = False,
+                          collect: Optional[List[str]] = None) -> List[Alert]:
+        """
+        Get all weather warnings for the specified countries as a single list.
+        The Atom feeds are fetched in parallel first, then all CAP documents
+        that are not cached yet; results keep the order of the countries and
+        of the feed entries. With `collect`, the warnings of those countries
+        are returned instead, fetched or not.
+        """
+        self._start_stats()
+        feeds = self._fetcher.map(lambda country: self._get_feed_jobs(country, conditional), countries)
+        jobs = [job for feed_jobs in feeds for job in feed_jobs]
+        if self.processes and jobs:
+            self._get_warnings_in_processes(jobs)
+        else:
+            self._fetcher.map(self._get_warning, jobs)
+        warnings = self._collect_warnings(collect or countries)
+        fetched = set(countries)
+        self._finish_stats(warnings if collect is None else [warning for warning in warnings
+                                                             if warning.country in fetched])
+        return warnings
 
-    def _get_all_warnings(self, countries: List[str]) -> List[Alert]:
-        """Get all weather warnings for the specified countries as a single list."""
-        all_warnings = []
+    def _iter_feed_entries(self, countries: List[str]) -> Iterator[Tuple[str, str, ET.Element]]:
+        """
+        Yield (country, CAP link, entry element) for the feeds of the countries
+        while they are downloaded, parsing them incrementally. Each entry is
+        dropped from the tree once it has been handled.
+        """
         for country in countries:
+            url = self.country_urls.get(country.lower())
+            response = None
             try:
-                country_warnings = self._get_warnings_for_country(country)
-                all_warnings.extend(country_warnings)
+                start = time.perf_counter()
+                response = self._request(country, url, stream=True)
+                parser = ET.XMLPullParser(events=('start', 'end'))
+                parents = []
+                # Time spent parsing, and suspended in the consumer
+                size = parse_time = suspended = 0
+                for chunk in response.iter_content(chunk_size=65536):
+                    size += len(chunk)
+                    parse_start = time.perf_counter()
+                    parser.feed(chunk)
+                    parse_time += time.perf_counter() - parse_start
+                    for event, elem in parser.read_events():
+                        if event == 'start':
+                            parents.append(elem)
+                            continue
+                        parents.pop()
+                        if elem.tag != _ATOM_ENTRY:
+                            continue
+                        link = self._get_entry_link(elem)
+                        if link:
+                            yield_start = time.perf_counter()
+                            yield country, link, elem
+                            suspended += time.perf_counter() - yield_start
+                        if parents:
+                            parents[-1].remove(elem)
+                parser.close()
+                duration = time.perf_counter() - start - suspended - parse_time
+                self._record_request(country, 'feed', url, response, duration, size, parse_time)
             except Exception as e:
-                print(f"Error fetching warnings for {country}: {str(e)}")
-        return all_warnings
+                self._request_failed('feed', country, url, e)
+            finally:
+                # Also when the consumer stops early, so the connection is not left half-read
+                if response is not None:
+                    response.close()
+
+    def iter_warnings(self, countries: Optional[List[str]] = None) -> Iterator[Alert]:
+        """
+        Yield warnings one by one, in feed order, as soon as they are parsed.
+        Feeds are parsed incrementally while they download, and CAP documents
+        are fetched in parallel a bounded number of entries ahead of the
+        consumer. Nothing is kept after it has been yielded, so memory stays
+        flat however many countries are streamed. The `deadline` runs from
+        the start of the iteration.
+        Update and Cancel messages are applied as they arrive, see
+        AlertStore.stream: Cancel messages are never yielded, but an Update
+        may follow the original it replaces if that came first. Lazy warnings
+        are yielded as listed, like in _country_warnings.
+        """
+        for country in countries or []:
+            if country.lower() not in self.country_urls:
+                raise ValueError(f"No URL configuration found for country: {country}")
+        return self._stream_warnings(countries or self.countries)
+
+    def _stream_warnings(self, countries: List[str]) -> Iterator[Alert]:
+        """Generator behind iter_warnings, started on the first next()."""
+        if self.server is not None:
+            # The snapshot of a server comes in one response per country
+            yield from self._get_all_warnings(countries)
+            return
+
+        self._start_stats()
+        stats = self.stats
+        messages = self._stream_messages(countries)
+        try:
+            for warning in messages if self.lazy else AlertStore().stream(messages):
+                stats.count_alerts((warning,))
+                yield warning
+        finally:
+            messages.close()
+            self._finish_stats(())
+
+    def _stream_messages(self, countries: List[str]) -> Iterator[Alert]:
+        """Yield the parsed CAP messages of the feeds of the countries, for _stream_warnings."""
+        entries = self._iter_feed_entries(countries)
+        if self.lazy:
+            try:
+                for country, link, entry in entries:
+                    yield self._parse_feed_entry(entry, country, link)
+            finally:
+                entries.close()
+            return
+
+        window = self._fetcher.max_workers * 2
+        pool = ThreadPoolExecutor(max_workers=self._fetcher.max_workers)
+        pending = deque()
+        try:
+            for country, link, _ in entries:
+                pending.append(pool.submit(self._download_warning, country, link))
+                while len(pending) >= window or (pending and pending[0].done()):
+                    warning = pending.popleft().result()
+                    if warning:
+                        yield warning
+            while pending:
+                warning = pending.popleft().result()
+                if warning:
+                    yield warning
+        finally:
+            entries.close()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def refresh(self, countries: Optional[List[str]] = None) -> List[Alert]:
+        """
+        Bring the warnings up to date with the feeds.
+        Feeds are requested conditionally (ETag / Last-Modified), and only CAP
+        documents that are new or changed are downloaded and parsed. Warnings
+        that disappeared from a feed are dropped. Pass `countries` to refresh
+        only some of the configured countries.
+        """
+        for country in countries or []:
+            if country not in self.countries:
+                raise ValueError(f"Country not configured for this instance: {country}")
+        self._set_warnings(self._get_all_warnings(countries or self.countries, conditional=True,
+                                                  collect=self.countries))
+        return self._warnings
+
+    def watch(self, interval: float = 300, intervals: Optional[Dict[str, float]] = None, jitter: float = 0.1,
+              callback: Optional[Callable[[AlertEvent], None]] = None) -> Watcher:
+        """
+        Return a Watcher that refreshes the countries every `interval` seconds
+        (or per country from `intervals`) and reports added, updated and
+        expired warnings to `callback` or by iterating over it; for an
+        AsyncMeteoAlarm, with `await apoll()` or `async for`.
+        """
+        return Watcher(self, interval, intervals, jitter, callback)
 
     def available_languages(self) -> Set[str]:
-        """Return a set of all available languages across all warnings."""
-        languages = set()
-        for warning in self._warnings:
-            languages.update(warning.get_available_languages())
-        return languages
+        """Return a set of all available languages across all warnings, collected once per snapshot."""
+        return set(self._get_index('languages', collect_languages))
+
+    def to_feature_collection(self, lang: str = "en", tolerance: Optional[float] = None) -> dict:
+        """Return all warnings as one GeoJSON FeatureCollection, see export.to_feature_collection."""
+        return export.to_feature_collection(self._warnings, lang, tolerance)
 
-    def filter(self, **kwargs) -> List[Alert]:
+    def to_columns(self, lang: str = "en") -> Dict[str, list]:
+        """Return all warnings as a dict of columns, e.g. for pandas.DataFrame(...)."""
+        return export.to_columns(self._warnings, lang)
+
+    def to_records(self, lang: str = "en"):
+        """Return all warnings as a NumPy record array; requires numpy."""
+        return export.to_records(self._warnings, lang)
+
+    def to_arrow(self, lang: str = "en", geometry: bool = False):
+        """Return all warnings as a pyarrow Table; requires pyarrow."""
+        return export.to_arrow(self._warnings, lang, geometry)
+
+    def filter(self, **kwargs) -> FilterResult:
         """
         Filter warnings based on provided criteria.
-        Returns a list of warnings that match ALL criteria.
+        Returns a list of warnings that match ALL criteria, which can be
+        filtered further by calling filter() on it. Besides `field=value`,
+        `field__in=[...]` and `field__gt/gte/lt/lte=value` are supported.
         """
-        filtered_warnings = []
-        for warning in self._warnings:
-            if warning.matches_filter(**kwargs):
-                filtered_warnings.append(warning)
-        return filtered_warnings
\ No newline at end of file
+        return self._get_index('query', AlertIndex).filter(**kwargs)
+
+    def search(self, query: str, lang: Union[str, List[str], None] = None,
+               fields: Optional[List[str]] = None) -> List[Alert]:
+        """
+        Return the warnings whose event, headline or description contain all
+        words of the query, case-insensitively; `term*` matches words by
+        prefix. Restrict to languages with `lang` and to fields with `fields`,
+        see SearchIndex.search.
+        """
+        return self._get_index('search', SearchIndex).search(query, lang, fields)
+
+    def get(self, identifier: str) -> Optional[Alert]:
+        """Return the current warning with the given CAP identifier, if any."""
+        return self._get_index('identifiers', AlertStore).get(identifier)
+
+    def warnings_at(self, lat: float, lon: float) -> List[Alert]:
+        """Return the warnings whose area contains the given location."""
+        return self._get_index('spatial', SpatialIndex).at(lat, lon)
+
+    def warnings_in_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> List[Alert]:
+        """Return the warnings whose area intersects the given bounding box."""
+        return self._get_index('spatial', SpatialIndex).in_bbox(min_lon, min_lat, max_lon, max_lat)
+
+    def active_at(self, t: Union[datetime, str, None] = None) -> List[Alert]:
+        """Return the warnings valid at time t (default: now), from onset until expiry."""
+        return self._get_index('intervals', IntervalIndex).active_at(t or datetime.now(pytz.UTC))
+
+    def overlapping(self, start: Union[datetime, str], end: Union[datetime, str]) -> List[Alert]:
+        """Return the warnings whose validity overlaps the window from start to end."""
+        return self._get_index('intervals', IntervalIndex).overlapping(start, end)
+
+
+def _parse_documents(documents: List[Tuple[str, bytes]], languages: Optional[Set[str]]):
+    """
+    Parse a batch of (country, CAP document) pairs in a worker process.
+    Return the (warning and geocode areas, or None, parse time) of every
+    document, and the (country, error) of every document that failed to parse.
+    """
+    errors: List[Tuple[str, Exception]] = []
+    parser = CapParser(languages, lambda country, error: errors.append((country, error)))
+    results = []
+    for country, content in documents:
+        start = time.perf_counter()
+        parsed = parser.parse(content, country)
+        results.append((parsed, time.perf_counter() - start))
+    return results, errors
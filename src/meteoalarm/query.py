@@ -0,0 +1,143 @@
+import operator
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Set
+
+if TYPE_CHECKING:
+    from .meteoalarm import Alert
+
+# Fields with hash indexes; EMMA_ID is read from the area of a warning
+INDEXED_FIELDS = ('country', 'severity', 'urgency', 'certainty', 'awareness_level', 'awareness_type', 'EMMA_ID')
+DATETIME_FIELDS = ('onset', 'effective', 'expires', 'sent')
+
+RANGE_OPERATORS = {
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+}
+
+
+def _field_value(alert: 'Alert', field: str) -> Any:
+    if field == 'EMMA_ID':
+        return alert.area.get('EMMA_ID') or None
+    return getattr(alert, field, None)
+
+
+def _matches(attr_value: Any, value: Any) -> bool:
+    """Plain filter semantics: case-insensitive substring for strings, equality otherwise."""
+    if attr_value is None:
+        return False
+    if isinstance(attr_value, str) and isinstance(value, str):
+        return value.lower() in attr_value.lower()
+    return attr_value == value
+
+
+def _equals(attr_value: Any, value: Any) -> bool:
+    """Membership semantics for `in`: case-insensitive equality for strings."""
+    if isinstance(attr_value, str) and isinstance(value, str):
+        return attr_value.lower() == value.lower()
+    return attr_value == value
+
+
+def _compare(op, attr_value: Any, value: Any) -> bool:
+    if attr_value is None:
+        return False
+    try:
+        return op(attr_value, value)
+    except TypeError:
+        return False
+
+
+def _coerce(field: str, value: Any) -> Any:
+    """Parse ISO strings given for datetime fields."""
+    if field in DATETIME_FIELDS and isinstance(value, str):
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value
+
+
+class FilterResult(list):
+    """List of warnings matching a filter, which can be narrowed further with filter()."""
+
+    def __init__(self, index: 'AlertIndex', positions: List[int]):
+        super().__init__(index.alerts[position] for position in positions)
+        self._index = index
+        self._positions = positions
+
+    def filter(self, **kwargs) -> 'FilterResult':
+        """Filter these warnings further, see MeteoAlarm.filter."""
+        return self._index.filter(self._positions, **kwargs)
+
+
+class AlertIndex:
+    """
+    Hash indexes over the warnings of a snapshot.
+    For every indexed field, the positions of the warnings are grouped by
+    value. The groups of a field are built on first use, so fields that are
+    never filtered on are never read. Criteria on indexed fields are answered
+    from the few distinct values of the field; other criteria are checked on
+    the remaining candidates only.
+    """
+
+    def __init__(self, alerts: Sequence['Alert']):
+        self.alerts = list(alerts)
+        self._postings: Dict[str, Dict[Any, List[int]]] = {}
+
+    def _field_postings(self, field: str) -> Dict[Any, List[int]]:
+        postings = self._postings.get(field)
+        if postings is None:
+            postings = {}
+            for position, alert in enumerate(self.alerts):
+                value = _field_value(alert, field)
+                if value is not None:
+                    postings.setdefault(value, []).append(position)
+            self._postings[field] = postings
+        return postings
+
+    def _indexed_positions(self, field: str, test) -> Set[int]:
+        positions = set()
+        for value, value_positions in self._field_postings(field).items():
+            if test(value):
+                positions.update(value_positions)
+        return positions
+
+    def filter(self, positions: Optional[Iterable[int]] = None, /, **kwargs) -> FilterResult:
+        """
+        Return the warnings matching all criteria, optionally among the given
+        positions; they are passed positionally, so that any field name can be
+        a criterion.
+        A criterion is either `field=value` with the semantics of
+        Alert.matches_filter, `field__in=[...]` for membership, or
+        `field__gt/gte/lt/lte=value` for ranges.
+        """
+        candidates = set(positions) if positions is not None else None
+        residual = []
+
+        for key, value in kwargs.items():
+            field, _, op = key.partition('__')
+            if op and op != 'in' and op not in RANGE_OPERATORS:
+                raise ValueError(f"Unsupported filter operator: {op}")
+
+            if op == 'in':
+                values = [_coerce(field, item) for item in value]
+                test = lambda attr_value, values=values: attr_value is not None and \
+                    any(_equals(attr_value, item) for item in values)
+            elif op:
+                test = lambda attr_value, op=RANGE_OPERATORS[op], value=_coerce(field, value): \
+                    _compare(op, attr_value, value)
+            elif field in INDEXED_FIELDS:
+                test = lambda attr_value, value=value: _matches(attr_value, value)
+            else:
+                residual.append(lambda alert, field=field, value=value: alert.matches_filter(**{field: value}))
+                continue
+
+            if field in INDEXED_FIELDS:
+                matched = self._indexed_positions(field, test)
+                candidates = matched if candidates is None else candidates & matched
+            else:
+                residual.append(lambda alert, field=field, test=test: test(getattr(alert, field, None)))
+
+        if candidates is None:
+            candidates = range(len(self.alerts))
+        matches = [position for position in sorted(candidates)
+                   if all(criterion(self.alerts[position]) for criterion in residual)]
+        return FilterResult(self, matches)
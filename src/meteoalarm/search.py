@@ -0,0 +1,102 @@
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+if TYPE_CHECKING:
+    from .meteoalarm import Alert
+
+# Multilingual text fields of a warning, by language code
+FIELDS = ('event', 'headline', 'description')
+
+_TOKEN = re.compile(r'\w+')
+# A query term, optionally followed by * for a prefix match
+_QUERY_TERM = re.compile(r'(\w+)(\*?)')
+
+
+def _normalize(text: str) -> str:
+    """Unicode-normalize and case-fold a text, so that e.g. "Straße" matches "STRASSE"."""
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split a text into normalized word tokens."""
+    return _TOKEN.findall(_normalize(text)) if text else []
+
+
+def collect_languages(alerts: Iterable['Alert']) -> FrozenSet[str]:
+    """Return the languages of all warnings, see Alert.get_available_languages."""
+    languages = set()
+    for alert in alerts:
+        languages.update(alert.get_available_languages())
+    return frozenset(languages)
+
+
+def _language_matches(language: str, requested: Tuple[str, ...]) -> bool:
+    """Match a language code against requested codes, by full code or primary subtag."""
+    return language in requested or language.split('-')[0] in requested
+
+
+class SearchIndex:
+    """
+    Inverted index over the event, headline and description texts of a
+    snapshot. Each text is tokenized and case-folded once, and every token
+    lists the positions of the warnings using it per (field, language).
+    Keyword queries read a few posting lists; prefix queries (`term*`) scan
+    the sorted vocabulary from the prefix on.
+    """
+
+    def __init__(self, alerts: Sequence['Alert']):
+        self.alerts = list(alerts)
+        self._postings: Dict[str, Dict[Tuple[str, str], List[int]]] = {}
+        for position, alert in enumerate(self.alerts):
+            for field in FIELDS:
+                for language, text in getattr(alert, field).items():
+                    key = (field, language)
+                    for token in set(tokenize(text)):
+                        self._postings.setdefault(token, {}).setdefault(key, []).append(position)
+        self._vocabulary = sorted(self._postings)
+
+    def _tokens(self, term: str, prefix: bool) -> Iterable[str]:
+        if not prefix:
+            return (term,) if term in self._postings else ()
+        tokens = []
+        for index in range(bisect_left(self._vocabulary, term), len(self._vocabulary)):
+            if not self._vocabulary[index].startswith(term):
+                break
+            tokens.append(self._vocabulary[index])
+        return tokens
+
+    def _positions(self, term: str, prefix: bool, fields: Tuple[str, ...],
+                   languages: Optional[Tuple[str, ...]]) -> Set[int]:
+        positions = set()
+        for token in self._tokens(term, prefix):
+            for (field, language), token_positions in self._postings[token].items():
+                if field in fields and (languages is None or _language_matches(language, languages)):
+                    positions.update(token_positions)
+        return positions
+
+    def search(self, query: str, lang: Union[str, Iterable[str], None] = None,
+               fields: Optional[Iterable[str]] = None) -> List['Alert']:
+        """
+        Return the warnings whose texts contain every term of the query, in
+        snapshot order. A term ending in * matches any word starting with it.
+        `lang` restricts the search to texts in one or several languages (full
+        code or primary subtag, e.g. "de"), `fields` to some of FIELDS.
+        """
+        fields = tuple(fields) if fields is not None else FIELDS
+        for field in fields:
+            if field not in FIELDS:
+                raise ValueError(f"Unsupported search field: {field}")
+        languages = (lang,) if isinstance(lang, str) else tuple(lang) if lang is not None else None
+
+        terms = _QUERY_TERM.findall(_normalize(query))
+        if not terms:
+            return []
+        matches = None
+        for term, star in terms:
+            positions = self._positions(term, bool(star), fields, languages)
+            matches = positions if matches is None else matches & positions
+            if not matches:
+                return []
+        return [self.alerts[position] for position in sorted(matches)]
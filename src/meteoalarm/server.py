@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from . import export
+from .query import AlertIndex
+
+if TYPE_CHECKING:
+    from .meteoalarm import Alert, MeteoAlarm
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that shape a response instead of filtering the warnings
+RESERVED_PARAMETERS = ('compact', 'lang', 'tolerance')
+# Filtered responses kept per snapshot, by path and query
+_MAX_CACHED_RESPONSES = 256
+
+Response = Tuple[bytes, str]  # body and ETag
+
+
+def _encode(data) -> Response:
+    """Serialize a response body; its ETag is a hash of the content, so it survives unchanged refreshes."""
+    body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def _criteria(parameters: Dict[str, str]) -> Dict[str, object]:
+    """Filter criteria from query parameters; `field__in` takes comma-separated values."""
+    criteria = {}
+    for key, value in parameters.items():
+        if key in RESERVED_PARAMETERS:
+            continue
+        criteria[key] = [item for item in value.split(',') if item] if key.endswith('__in') else value
+    return criteria
+
+
+class Snapshot:
+    """
+    The warnings of one refresh with their serialized responses.
+    The unfiltered JSON and GeoJSON responses are built up front; filtered
+    ones are built on first request, with the filter semantics of
+    MeteoAlarm.filter, and kept for the lifetime of the snapshot.
+    """
+
+    def __init__(self, alarm: 'MeteoAlarm'):
+        self.alarm = alarm
+        self.warnings: List['Alert'] = list(alarm._warnings)
+        self.generated = datetime.now(timezone.utc)
+        # Stats of the refresh that produced the warnings; alarm.stats is replaced by the next one
+        self.stats = alarm.stats.summary()
+        self._index = AlertIndex(self.warnings)
+        self._responses: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Response] = {}
+        self._lock = threading.Lock()
+        for path, parameters in (('/warnings', {}), ('/warnings', {'compact': '1'}), ('/warnings.geojson', {})):
+            self.response(path, parameters)
+
+    def _render(self, path: str, parameters: Dict[str, str]) -> Response:
+        criteria = _criteria(parameters)
+        warnings = self._index.filter(**criteria) if criteria else self.warnings
+        if path == '/warnings.geojson':
+            tolerance = float(parameters['tolerance']) if 'tolerance' in parameters else None
+            if tolerance is not None and tolerance < 0:
+                raise ValueError("tolerance must not be negative")
+            return _encode(export.to_feature_collection(warnings, parameters.get('lang', 'en'), tolerance))
+        if parameters.get('compact', '0') not in ('', '0'):
+            # Geometries of geocode areas are left out; clients restore them from their own geocodes
+            return _encode([self.alarm._dump_alert(warning) for warning in warnings])
+        return _encode([warning.to_dict() for warning in warnings])
+
+    def response(self, path: str, parameters: Dict[str, str]) -> Response:
+        """
+        Return the body and ETag of /warnings or /warnings.geojson for the query
+        parameters; raises ValueError for invalid filters.
+        """
+        key = (path, tuple(sorted(parameters.items())))
+        response = self._responses.get(key)
+        if response is None:
+            response = self._render(path, parameters)
+            with self._lock:
+                if len(self._responses) < _MAX_CACHED_RESPONSES:
+                    self._responses[key] = response
+        return response
+
+    def status(self) -> dict:
+        return {
+            'countries': self.alarm.countries,
+            'warnings': len(self.warnings),
+            'generated': self.generated.isoformat(),
+            'stats': self.stats,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'SnapshotServer'
+
+    _CONTENT_TYPES = {'/warnings': 'application/json', '/warnings.geojson': 'application/geo+json'}
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parameters = dict(parse_qsl(url.query, keep_blank_values=True))
+        snapshot = self.server.snapshot
+        if url.path == '/status':
+            self._send(200, 'application/json', *_encode(snapshot.status()))
+            return
+        if url.path not in self._CONTENT_TYPES:
+            self._send(404, 'application/json', *_encode({'error': f"Not found: {url.path}"}))
+            return
+        try:
+            body, etag = snapshot.response(url.path, parameters)
+        except ValueError as e:
+            self._send(400, 'application/json', *_encode({'error': str(e)}))
+            return
+        matches = [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]
+        if etag in matches or '*' in matches:
+            self._send(304, None, b'', etag)
+        else:
+            self._send(200, self._CONTENT_TYPES[url.path], body, etag)
+
+    def _send(self, status: int, content_type: Optional[str], body: bytes, etag: Optional[str] = None):
+        self.send_response(status)
+        if content_type is not None:
+            self.send_header('Content-Type', content_type)
+        if etag is not None:
+            self.send_header('ETag', etag)
+            # Clients revalidate every time; unchanged snapshots are answered with 304
+            self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class SnapshotServer(ThreadingHTTPServer):
+    """
+    Local HTTP server for the warnings of one MeteoAlarm, so that many
+    clients share a single scraper. The warnings are refreshed every
+    `interval` seconds on a background thread, see MeteoAlarm.refresh, and
+    served from an immutable Snapshot that is swapped in once it is ready:
+
+    - GET /warnings: JSON list of Alert.to_dict(), filtered by query
+      parameters as MeteoAlarm.filter, e.g. ?country=estonia&severity__in=Severe,Extreme;
+      `compact=1` leaves out geometries of geocode areas
+    - GET /warnings.geojson: FeatureCollection with the same filters, and `lang` and `tolerance`
+    - GET /status: snapshot time, warning count and the stats of the last refresh
+
+    Responses carry ETags; requests with a matching If-None-Match get a 304.
+    Point clients at it with MeteoAlarm(countries, server=url).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, alarm: 'MeteoAlarm', address: Tuple[str, int] = ('127.0.0.1', 8787), interval: float = 300):
+        if interval <= 0:
+            raise ValueError("Refresh interval must be positive")
+        super().__init__(address, _Handler)
+        self.alarm = alarm
+        self.interval = interval
+        self.snapshot = Snapshot(alarm)
+        self._stop = threading.Event()
+        self._serving: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def refresh(self):
+        """Refresh the warnings and swap in a new snapshot if any of them changed."""
+        warnings = self.alarm.refresh()
+        previous = self.snapshot.warnings
+        if len(warnings) != len(previous) or any(new is not old for new, old in zip(warnings, previous)):
+            self.snapshot = Snapshot(self.alarm)
+        else:
+            self.snapshot.stats = self.alarm.stats.summary()
+
+    def _refresh_periodically(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Snapshot refresh failed")
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        """Serve requests until shutdown(), refreshing the warnings in the background meanwhile."""
+        self._stop.clear()
+        refresher = threading.Thread(target=self._refresh_periodically, name='meteoalarm-refresh', daemon=True)
+        refresher.start()
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self._stop.set()
+
+    def start(self) -> 'SnapshotServer':
+        """Serve on a background thread; stop() ends it."""
+        self._serving = threading.Thread(target=self.serve_forever, name='meteoalarm-server', daemon=True)
+        self._serving.start()
+        return self
+
+    def stop(self):
+        """Stop serving and refreshing, and release the socket."""
+        if self._serving is not None:
+            self.shutdown()
+            self._serving.join()
+            self._serving = None
+        self.server_close()
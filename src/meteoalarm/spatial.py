@@ -0,0 +1,265 @@
+import json
+import math
+from array import array
+from collections import defaultdict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    from .meteoalarm import Alert
+
+Point = Tuple[float, float]
+Ring = List[Point]
+Polygon = List[Ring]
+BBox = Tuple[float, float, float, float]
+
+
+def parse_polygons(geometry: Optional[str]) -> List[Polygon]:
+    """Parse a GeoJSON Polygon or MultiPolygon string into a list of polygons of (x, y) rings."""
+    if not geometry:
+        return []
+    try:
+        data = json.loads(geometry)
+    except ValueError:
+        return []
+    if data.get('type') == 'Polygon':
+        polygons = [data['coordinates']]
+    elif data.get('type') == 'MultiPolygon':
+        polygons = data['coordinates']
+    else:
+        return []
+    return [[[(point[0], point[1]) for point in ring] for ring in polygon if ring] for polygon in polygons]
+
+
+def geometry_bbox(data: dict) -> Optional[BBox]:
+    """Return the bounding box of the outer rings of a GeoJSON Polygon or MultiPolygon."""
+    if data.get('type') == 'Polygon':
+        shells = data['coordinates'][:1]
+    elif data.get('type') == 'MultiPolygon':
+        shells = [polygon[0] for polygon in data['coordinates'] if polygon]
+    else:
+        return None
+    xs = [point[0] for shell in shells for point in shell]
+    ys = [point[1] for shell in shells for point in shell]
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+# Alerts of the same area share one geometry string, so results are cached by string
+@lru_cache(maxsize=4096)
+def _string_bbox(geometry: str) -> Optional[BBox]:
+    try:
+        return geometry_bbox(json.loads(geometry))
+    except ValueError:
+        return None
+
+
+def shape_bbox(shape: Union[str, array, None]) -> Optional[BBox]:
+    """Return the bounding box of a GeoJSON string or of a packed (x, y) polygon."""
+    if type(shape) is array:
+        if not shape:
+            return None
+        return min(shape[0::2]), min(shape[1::2]), max(shape[0::2]), max(shape[1::2])
+    if not shape:
+        return None
+    return _string_bbox(shape)
+
+
+def _segment_distance(point, start, end) -> float:
+    """Squared distance of a point to the segment from start to end."""
+    x1, y1 = start[0], start[1]
+    dx, dy = end[0] - x1, end[1] - y1
+    px, py = point[0] - x1, point[1] - y1
+    length = dx * dx + dy * dy
+    if length:
+        # Clamp the projection to the ends of the segment
+        t = min(max((px * dx + py * dy) / length, 0.0), 1.0)
+        px, py = px - t * dx, py - t * dy
+    return px * px + py * py
+
+
+def _simplify_line(points: list, first: int, last: int, tolerance: float, keep: List[bool]):
+    """Douglas-Peucker: mark the vertices between first and last that are kept."""
+    squared = tolerance * tolerance
+    stack = [(first, last)]
+    while stack:
+        first, last = stack.pop()
+        farthest, distance = None, squared
+        for index in range(first + 1, last):
+            candidate = _segment_distance(points[index], points[first], points[last])
+            if candidate > distance:
+                farthest, distance = index, candidate
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+
+
+def simplify_ring(ring: list, tolerance: float) -> list:
+    """
+    Simplify a closed ring with the Douglas-Peucker algorithm, split at the
+    vertex farthest from its start. A ring never collapses below a triangle.
+    """
+    if len(ring) <= 4 or ring[0] != ring[-1]:
+        return ring
+    x0, y0 = ring[0][0], ring[0][1]
+    split = max(range(len(ring)), key=lambda i: (ring[i][0] - x0) ** 2 + (ring[i][1] - y0) ** 2)
+    keep = [False] * len(ring)
+    keep[0] = keep[split] = keep[-1] = True
+    _simplify_line(ring, 0, split, tolerance, keep)
+    _simplify_line(ring, split, len(ring) - 1, tolerance, keep)
+    if keep.count(True) < 4:
+        # Keep the vertex farthest from the axis of the ring as the third corner
+        corner = max(range(1, len(ring) - 1), key=lambda i: _segment_distance(ring[i], ring[0], ring[split]))
+        keep[corner] = True
+    return [point for point, kept in zip(ring, keep) if kept]
+
+
+@lru_cache(maxsize=4096)
+def simplify_geometry(geometry: str, tolerance: float) -> str:
+    """
+    Return a GeoJSON Polygon or MultiPolygon string with every ring
+    simplified to within `tolerance` degrees; other geometries are returned
+    unchanged. Results are cached per geometry string and tolerance.
+    """
+    data = json.loads(geometry)
+    if data.get('type') == 'Polygon':
+        coordinates = [simplify_ring(ring, tolerance) for ring in data['coordinates']]
+    elif data.get('type') == 'MultiPolygon':
+        coordinates = [[simplify_ring(ring, tolerance) for ring in polygon] for polygon in data['coordinates']]
+    else:
+        return geometry
+    return json.dumps({'type': data['type'], 'coordinates': coordinates})
+
+
+def _in_ring(x: float, y: float, ring: Ring) -> bool:
+    """Ray casting test of a point against a single ring."""
+    inside = False
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def point_in_polygons(x: float, y: float, polygons: List[Polygon]) -> bool:
+    """Test whether a point lies in any of the polygons, respecting holes."""
+    for polygon in polygons:
+        if _in_ring(x, y, polygon[0]) and not any(_in_ring(x, y, hole) for hole in polygon[1:]):
+            return True
+    return False
+
+
+def _segments_cross(a: Point, b: Point, c: Point, d: Point) -> bool:
+    """Test whether segments ab and cd intersect."""
+    def orientation(p: Point, q: Point, r: Point) -> float:
+        return (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+
+    def on_segment(p: Point, q: Point, r: Point) -> bool:
+        return min(p[0], q[0]) <= r[0] <= max(p[0], q[0]) and min(p[1], q[1]) <= r[1] <= max(p[1], q[1])
+
+    d1, d2 = orientation(c, d, a), orientation(c, d, b)
+    d3, d4 = orientation(a, b, c), orientation(a, b, d)
+    if d1 * d2 < 0 and d3 * d4 < 0:
+        return True
+    return (d1 == 0 and on_segment(c, d, a)) or (d2 == 0 and on_segment(c, d, b)) or \
+        (d3 == 0 and on_segment(a, b, c)) or (d4 == 0 and on_segment(a, b, d))
+
+
+def polygons_intersect_bbox(polygons: List[Polygon], bbox: BBox) -> bool:
+    """Test whether any of the polygons intersects the bounding box."""
+    min_x, min_y, max_x, max_y = bbox
+    corners = [(min_x, min_y), (max_x, min_y), (max_x, max_y), (min_x, max_y)]
+    box_edges = list(zip(corners, corners[1:] + corners[:1]))
+    for polygon in polygons:
+        shell = polygon[0]
+        if any(min_x <= x <= max_x and min_y <= y <= max_y for x, y in shell):
+            return True
+        if any(point_in_polygons(x, y, [polygon]) for x, y in corners):
+            return True
+        for a, b in zip(shell, shell[1:] + shell[:1]):
+            if any(_segments_cross(a, b, c, d) for c, d in box_edges):
+                return True
+    return False
+
+
+class SpatialIndex:
+    """
+    Grid index over the geometries of a list of alerts.
+    Each alert is registered in every grid cell its precomputed bounding box
+    covers, see Alert.bbox; a geometry is only parsed once a query has to
+    test its polygons, and then shared by all alerts of the same area.
+    Coordinates follow GeoJSON, i.e. (lon, lat).
+    """
+
+    def __init__(self, alerts: Sequence['Alert'], cell_size: float = 1.0):
+        self.cell_size = cell_size
+        self._alerts = list(alerts)
+        self._bboxes: List[Optional[BBox]] = []
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        # Parsed polygons by position, and by geometry string for alerts of the same area
+        self._polygons: Dict[int, List[Polygon]] = {}
+        self._parsed: Dict[str, List[Polygon]] = {}
+
+        for position, alert in enumerate(self._alerts):
+            bbox = alert.bbox
+            self._bboxes.append(bbox)
+            if bbox is None:
+                continue
+            for cell in self._cells_for(bbox):
+                self._cells[cell].append(position)
+
+    def _polygons_at(self, position: int) -> List[Polygon]:
+        """Return the polygons of the alert at a position, parsing its geometry on first use."""
+        polygons = self._polygons.get(position)
+        if polygons is None:
+            geometry = self._alerts[position].geometry
+            polygons = self._parsed.get(geometry)
+            if polygons is None:
+                polygons = self._parsed[geometry] = parse_polygons(geometry)
+            self._polygons[position] = polygons
+        return polygons
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _cells_for(self, bbox: BBox):
+        min_cx, min_cy = self._cell(bbox[0], bbox[1])
+        max_cx, max_cy = self._cell(bbox[2], bbox[3])
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                yield cx, cy
+
+    def at(self, lat: float, lon: float) -> List['Alert']:
+        """Return the alerts whose geometry contains the point, in snapshot order."""
+        matches = []
+        for position in self._cells.get(self._cell(lon, lat), []):
+            min_x, min_y, max_x, max_y = self._bboxes[position]
+            if min_x <= lon <= max_x and min_y <= lat <= max_y and \
+                    point_in_polygons(lon, lat, self._polygons_at(position)):
+                matches.append(position)
+        return [self._alerts[position] for position in sorted(matches)]
+
+    def in_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> List['Alert']:
+        """Return the alerts whose geometry intersects the bounding box, in snapshot order."""
+        query = (min_lon, min_lat, max_lon, max_lat)
+        min_cx, min_cy = self._cell(min_lon, min_lat)
+        max_cx, max_cy = self._cell(max_lon, max_lat)
+        if (max_cx - min_cx + 1) * (max_cy - min_cy + 1) > len(self._cells):
+            # Large query boxes cover more cells than are occupied
+            candidates = {position for position, bbox in enumerate(self._bboxes) if bbox is not None}
+        else:
+            candidates = set()
+            for cell in self._cells_for(query):
+                candidates.update(self._cells.get(cell, []))
+
+        matches = []
+        for position in sorted(candidates):
+            bbox = self._bboxes[position]
+            if bbox[0] > max_lon or bbox[2] < min_lon or bbox[1] > max_lat or bbox[3] < min_lat:
+                continue
+            if polygons_intersect_bbox(self._polygons_at(position), query):
+                matches.append(position)
+        return [self._alerts[position] for position in matches]
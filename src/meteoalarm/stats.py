@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Stages at which a fetch can fail: the Atom feed of a country, the download
+# of a CAP document, the parsing of a CAP document, and requests skipped
+# because the fetch deadline passed or the circuit of the country was open
+STAGES = ('feed', 'download', 'parse', 'deadline', 'circuit')
+
+# Instrumentation hook, called with an event name and its attributes
+Hook = Callable[[str, Dict[str, object]], None]
+
+
+@dataclass
+class RequestStats:
+    """Timing and size of a single HTTP request."""
+    country: str
+    kind: str  # 'feed' or 'cap'
+    url: str
+    status: int
+    elapsed: float  # seconds until the response headers arrived, including DNS and connection setup
+    duration: float  # seconds including the wait for a host slot and the download of the body
+    bytes: int
+    parse_time: float = 0.0
+
+
+@dataclass
+class CountryStats:
+    """Totals of the requests, parsing, alerts and errors of one country."""
+    country: str
+    requests: int = 0
+    bytes: int = 0
+    download_time: float = 0.0
+    parse_time: float = 0.0
+    alerts: int = 0
+    errors: Counter = field(default_factory=Counter)
+
+    @property
+    def total_time(self) -> float:
+        return self.download_time + self.parse_time
+
+
+class FetchStats:
+    """
+    Metrics of one fetch: construction, refresh(), iter_warnings() or an
+    async fetch. Requests are recorded from the worker threads as they
+    complete. If a `hook` is given, it is called OpenTelemetry-style with an
+    event name and attributes for every request ('meteoalarm.request'),
+    failure ('meteoalarm.error') and completed fetch ('meteoalarm.fetch').
+    """
+
+    def __init__(self, hook: Optional[Hook] = None):
+        self.started = time.time()
+        self.duration: Optional[float] = None
+        self.requests: List[RequestStats] = []
+        self.countries: Dict[str, CountryStats] = {}
+        self.errors: Counter = Counter()
+        self._hook = hook
+        # Reentrant, since summary() reads the locked totals
+        self._lock = threading.RLock()
+        self._clock = time.perf_counter()
+
+    def _country(self, country: str) -> CountryStats:
+        stats = self.countries.get(country)
+        if stats is None:
+            stats = self.countries[country] = CountryStats(country)
+        return stats
+
+    def _emit(self, name: str, attributes: Dict[str, object]):
+        """Call the hook; a failing hook is logged and never breaks a fetch."""
+        if self._hook is None:
+            return
+        try:
+            self._hook(name, attributes)
+        except Exception:
+            logger.exception("Instrumentation hook failed for %s", name)
+
+    def record_request(self, request: RequestStats):
+        """Add a completed request to the totals of its country."""
+        with self._lock:
+            self.requests.append(request)
+            stats = self._country(request.country)
+            stats.requests += 1
+            stats.bytes += request.bytes
+            stats.download_time += request.duration
+            stats.parse_time += request.parse_time
+        self._emit('meteoalarm.request', asdict(request))
+
+    def record_error(self, stage: str, country: str, url: Optional[str], error: Exception):
+        """Count a failure at one of STAGES for a country."""
+        with self._lock:
+            self.errors[stage] += 1
+            self._country(country).errors[stage] += 1
+        self._emit('meteoalarm.error', {
+            'stage': stage, 'country': country, 'url': url,
+            'error': type(error).__name__, 'message': str(error),
+        })
+
+    def count_alerts(self, alerts: Iterable) -> None:
+        """Add alerts to the alert counts of their countries."""
+        with self._lock:
+            for alert in alerts:
+                self._country(alert.country).alerts += 1
+
+    def finish(self):
+        """Mark the fetch as complete and report its summary to the hook."""
+        self.duration = time.perf_counter() - self._clock
+        self._emit('meteoalarm.fetch', self.summary())
+
+    @property
+    def bytes(self) -> int:
+        with self._lock:
+            return sum(stats.bytes for stats in self.countries.values())
+
+    @property
+    def alerts(self) -> int:
+        with self._lock:
+            return sum(stats.alerts for stats in self.countries.values())
+
+    @property
+    def incomplete(self) -> List[str]:
+        """Countries for which some feed or CAP document could not be fetched or parsed."""
+        with self._lock:
+            return [country for country, stats in self.countries.items() if sum(stats.errors.values())]
+
+    def slowest(self, n: int = 5) -> List[CountryStats]:
+        """Return the n countries that took longest to download and parse."""
+        with self._lock:
+            return sorted(self.countries.values(), key=lambda stats: stats.total_time, reverse=True)[:n]
+
+    def summary(self) -> Dict[str, object]:
+        """Return the totals of the fetch and per country as plain values."""
+        with self._lock:
+            return {
+                'duration': self.duration,
+                'requests': len(self.requests),
+                'bytes': self.bytes,
+                'alerts': self.alerts,
+                'errors': dict(self.errors),
+                'incomplete': self.incomplete,
+                'countries': {
+                    country: dict(asdict(stats), errors=dict(stats.errors))
+                    for country, stats in self.countries.items()
+                },
+            }
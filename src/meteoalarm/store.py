@@ -0,0 +1,83 @@
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Union
+
+if TYPE_CHECKING:
+    from .meteoalarm import Alert
+
+# CAP message types that carry a warning
+WARNING_TYPES = ('alert', 'update')
+
+
+class AlertStore:
+    """
+    Current version of each warning, keyed by CAP identifier.
+    Messages are applied with CAP semantics: an Alert adds a warning, an
+    Update replaces the warnings it references, and a Cancel removes them.
+    Referenced identifiers are remembered as superseded, so a message that
+    arrives after its update or cancellation is ignored. Applying a message
+    takes constant time per reference. Warnings without an identifier
+    cannot be referenced, and are kept as they are.
+    """
+
+    def __init__(self, alerts: Iterable['Alert'] = ()):
+        # Warnings without an identifier are keyed by a unique object instead
+        self._alerts: Dict[Union[str, object], 'Alert'] = {}
+        # Superseded identifier -> identifier of the Update or Cancel that superseded it
+        self._superseded: Dict[str, str] = {}
+        for alert in alerts:
+            self.apply(alert)
+
+    def apply(self, alert: 'Alert') -> bool:
+        """Apply a CAP message; return whether it changed the current warnings."""
+        return self._apply(alert, keep=True)
+
+    def stream(self, alerts: Iterable['Alert']) -> Iterator['Alert']:
+        """
+        Apply CAP messages as they arrive and yield the warnings among them:
+        Cancel messages and warnings superseded by an earlier message are left
+        out. An Update may still follow the original it replaces, since that
+        was yielded before the Update arrived. Only superseded identifiers are
+        remembered, not the yielded warnings.
+        """
+        for alert in alerts:
+            if self.admit(alert):
+                yield alert
+
+    def admit(self, alert: 'Alert') -> bool:
+        """Apply a CAP message as stream() does; return whether it is a warning to pass on."""
+        return self._apply(alert, keep=False) and alert.msg_type.lower() in WARNING_TYPES
+
+    def _apply(self, alert: 'Alert', keep: bool) -> bool:
+        identifier = alert.identifier
+        if identifier and identifier in self._superseded:
+            return False
+        changed = False
+        for reference in alert.references:
+            if reference and reference != identifier:
+                changed = self._alerts.pop(reference, None) is not None or changed
+                self._superseded[reference] = identifier
+        if alert.msg_type.lower() not in WARNING_TYPES:
+            return changed
+        if keep:
+            self._alerts[identifier or object()] = alert
+        return True
+
+    def get(self, identifier: str) -> Optional['Alert']:
+        """Return the current warning with the identifier, if any."""
+        return self._alerts.get(identifier) if identifier else None
+
+    def superseded_by(self, identifier: str) -> Optional[str]:
+        """Return the identifier of the message that updated or cancelled a warning, if any."""
+        return self._superseded.get(identifier)
+
+    def alerts(self) -> List['Alert']:
+        """Return the current warnings, in the order they were applied."""
+        return list(self._alerts.values())
+
+    def __contains__(self, identifier) -> bool:
+        return bool(identifier) and identifier in self._alerts
+
+    def __iter__(self) -> Iterator['Alert']:
+        return iter(self._alerts.values())
+
+    def __len__(self) -> int:
+        return len(self._alerts)
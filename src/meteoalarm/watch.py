@@ -0,0 +1,219 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .intervals import to_timestamp
+
+if TYPE_CHECKING:
+    from .meteoalarm import Alert, MeteoAlarm
+
+logger = logging.getLogger(__name__)
+
+ADDED = 'added'
+UPDATED = 'updated'
+EXPIRED = 'expired'
+
+
+@dataclass
+class AlertEvent:
+    """A change of a warning: added, updated (with the previous version) or expired."""
+    kind: str
+    alert: 'Alert'
+    previous: Optional['Alert'] = None
+
+
+class Watcher:
+    """
+    Poll the feeds of a MeteoAlarm on a schedule and report changes.
+    Each country is refreshed every `interval` seconds (or its entry in
+    `intervals`), spread by a random `jitter` share of the interval. Refreshes
+    are incremental, see MeteoAlarm.refresh, and only the warnings of the
+    refreshed countries are compared, by identifier, or by CAP link for
+    warnings without one. A warning is `added`
+    when it appears, `updated` when its feed entry changes or a CAP Update
+    replaces it, and `expired` when it leaves the feed or its expiry time
+    has passed. Watchers of an AsyncMeteoAlarm are polled with `await apoll()`
+    or `async for`.
+    """
+
+    def __init__(self, alarm: 'MeteoAlarm', interval: float = 300, intervals: Optional[Dict[str, float]] = None,
+                 jitter: float = 0.1, callback: Optional[Callable[[AlertEvent], None]] = None):
+        if interval <= 0 or any(value <= 0 for value in (intervals or {}).values()):
+            raise ValueError("Polling intervals must be positive")
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter must be between 0 and 1")
+        for country in intervals or {}:
+            if country not in alarm.countries:
+                raise ValueError(f"Country not configured for this instance: {country}")
+
+        self.alarm = alarm
+        self.interval = interval
+        self.intervals = dict(intervals or {})
+        self.jitter = jitter
+        self.callback = callback
+        # Current warnings by (country, identifier or link), and their expiry times as a heap
+        self._current: Dict[Tuple[str, str], 'Alert'] = {}
+        self._expiry: List[Tuple[float, int, Tuple[str, str], 'Alert']] = []
+        self._sequence = itertools.count()
+        # Every country is due at the first poll
+        self._due = {country: 0.0 for country in alarm.countries}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _schedule(self, country: str, now: float):
+        interval = self.intervals.get(country, self.interval)
+        self._due[country] = now + interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _track(self, key: Tuple[str, str], alert: 'Alert'):
+        self._current[key] = alert
+        if alert.expires is not None:
+            heapq.heappush(self._expiry, (to_timestamp(alert.expires, 0), next(self._sequence), key, alert))
+
+    def _diff(self, country: str, now: float) -> List[AlertEvent]:
+        """Compare the warnings of a refreshed country with the ones reported before."""
+        events = []
+        listed = {}
+        for link, alert in self.alarm._country_entries(country):
+            if alert.expires is not None and to_timestamp(alert.expires, 0) <= now:
+                continue
+            key = (country, alert.identifier or link)
+            listed[key] = alert
+            previous = self._current.get(key)
+            if previous is None and not self.alarm.lazy:
+                # An Update reported as a new version of the warning it replaces
+                replaced = next((reference for reference in alert.references
+                                 if (country, reference) in self._current), None)
+                if replaced is not None:
+                    previous = self._current.pop((country, replaced))
+                    events.append(AlertEvent(UPDATED, alert, previous))
+                    self._track(key, alert)
+                    continue
+                events.append(AlertEvent(ADDED, alert))
+                self._track(key, alert)
+            elif previous is not alert:
+                events.append(AlertEvent(UPDATED, alert, previous))
+                self._track(key, alert)
+        for key in [key for key in self._current if key[0] == country and key not in listed]:
+            events.append(AlertEvent(EXPIRED, self._current.pop(key)))
+        return events
+
+    def _expire(self, now: float) -> List[AlertEvent]:
+        """Report the current warnings whose expiry time has passed."""
+        events = []
+        while self._expiry and self._expiry[0][0] <= now:
+            _, _, key, alert = heapq.heappop(self._expiry)
+            # Entries of warnings that were updated or removed since are stale
+            if self._current.get(key) is alert:
+                del self._current[key]
+                events.append(AlertEvent(EXPIRED, alert))
+        return events
+
+    @property
+    def _is_async(self) -> bool:
+        return inspect.iscoroutinefunction(self.alarm.refresh)
+
+    def poll(self, now: Optional[datetime] = None) -> List[AlertEvent]:
+        """
+        Refresh the countries that are due, and return the events since the
+        last poll; `now` overrides the current time for expiry. The first
+        poll reports all current warnings as added.
+        """
+        if self._is_async:
+            raise TypeError("Watchers of an AsyncMeteoAlarm are polled with apoll()")
+        clock = time.monotonic()
+        due = [country for country, due_at in self._due.items() if due_at <= clock]
+        if due:
+            self.alarm.refresh(due)
+        return self._report(due, clock, now)
+
+    async def apoll(self, now: Optional[datetime] = None) -> List[AlertEvent]:
+        """Asyncio counterpart of poll(), for watchers of an AsyncMeteoAlarm."""
+        if not self._is_async:
+            raise TypeError("apoll() requires an AsyncMeteoAlarm; use poll()")
+        clock = time.monotonic()
+        due = [country for country, due_at in self._due.items() if due_at <= clock]
+        if due:
+            await self.alarm.refresh(due)
+        return self._report(due, clock, now)
+
+    def _report(self, due: List[str], clock: float, now: Optional[datetime]) -> List[AlertEvent]:
+        """Collect the events of a poll that refreshed the `due` countries, and pass them to the callback."""
+        timestamp = to_timestamp(now, 0) if now is not None else time.time()
+        events = []
+        for country in due:
+            self._schedule(country, clock)
+            events.extend(self._diff(country, timestamp))
+        events.extend(self._expire(timestamp))
+
+        if self.callback is not None:
+            for event in events:
+                try:
+                    self.callback(event)
+                except Exception:
+                    logger.exception("Watcher callback failed for %s event", event.kind)
+        return events
+
+    def _delay(self) -> float:
+        """Seconds until the next country is due or the next warning expires."""
+        wake = min(self._due.values()) - time.monotonic()
+        if self._expiry:
+            wake = min(wake, self._expiry[0][0] - time.time())
+        return max(wake, 0.0)
+
+    def _wait(self):
+        """Sleep until the next country is due or the next warning expires, or until stopped."""
+        self._stop.wait(self._delay())
+
+    def events(self) -> Iterator[AlertEvent]:
+        """Poll until stop() is called, yielding the events as they occur."""
+        self._stop.clear()
+        while not self._stop.is_set():
+            yield from self.poll()
+            self._wait()
+
+    def __iter__(self) -> Iterator[AlertEvent]:
+        return self.events()
+
+    async def aevents(self) -> AsyncIterator[AlertEvent]:
+        """Poll with apoll() until stop() is called, yielding the events as they occur."""
+        self._stop.clear()
+        while not self._stop.is_set():
+            for event in await self.apoll():
+                yield event
+            await asyncio.sleep(self._delay())
+
+    def __aiter__(self) -> AsyncIterator[AlertEvent]:
+        return self.aevents()
+
+    def start(self) -> 'Watcher':
+        """Poll on a background thread, reporting events to the callback."""
+        if self._is_async:
+            raise TypeError("Watchers of an AsyncMeteoAlarm are polled with apoll()")
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError("Watcher is already running")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='meteoalarm-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Watcher poll failed")
+            self._wait()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop polling; waits for a background thread to finish its current poll."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
@@ -1,9 +1,21 @@
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
 from unittest.mock import patch, mock_open
+import asyncio
 import json
-from meteoalarm import MeteoAlarm, Alert
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+import requests
+from meteoalarm import MeteoAlarm, Alert, AlertCache, AsyncMeteoAlarm
+from meteoalarm.meteoalarm import ALERT_FIELDS, CapParser
+from meteoalarm.fetcher import CircuitBreaker, DeadlineExceeded, Fetcher
+from meteoalarm.geocodes import GeocodeStore, compile_geocodes
+from meteoalarm.server import SnapshotServer
 
 # Sample test data
 SAMPLE_URLS_YAML = """
@@ -82,7 +94,12 @@ SAMPLE_CAP_XML = """<?xml version="1.0" encoding="UTF-8"?>
 @pytest.fixture
 def mock_files(monkeypatch):
     """Mock file operations for configuration files."""
+    real_open = open
+
     def mock_file_open(*args, **kwargs):
+        if isinstance(args[0], int):
+            # File descriptors, e.g. pipes to worker processes
+            return real_open(*args, **kwargs)
         if 'MeteoAlarm_urls.yaml' in str(args[0]):
             return mock_open(read_data=SAMPLE_URLS_YAML)(*args, **kwargs)
         elif 'geocodes.json' in str(args[0]):
@@ -96,22 +113,53 @@ def mock_files(monkeypatch):
 def mock_requests(monkeypatch):
     """Mock HTTP requests."""
     class MockResponse:
-        def __init__(self, content, status_code=200):
+        def __init__(self, content, status_code=200, headers=None):
             self.content = content.encode('utf-8')
             self.status_code = status_code
+            self.headers = headers or {}
+            self.elapsed = timedelta(milliseconds=5)
 
         def raise_for_status(self):
-            if self.status_code != 200:
+            if self.status_code >= 400:
                 raise Exception("HTTP Error")
 
-    def mock_get(url):
+        def close(self):
+            mock_get.closed += 1
+
+        def iter_content(self, chunk_size=1):
+            for start in range(0, len(self.content), chunk_size):
+                yield self.content[start:start + chunk_size]
+
+    real_get = requests.Session.get
+
+    def mock_get(self, url, **kwargs):
+        mock_get.calls.append(url)
+        if url.startswith('http://127.0.0.1'):
+            # Local servers started by the tests are requested for real
+            return real_get(self, url, **kwargs)
+        if mock_get.failures:
+            mock_get.failures -= 1
+            raise requests.ConnectionError("Connection reset")
         if 'feeds/meteoalarm-legacy-atom' in url:
-            return MockResponse(SAMPLE_ATOM_FEED)
+            etag = f'"{hash(mock_get.feed)}"'
+            if kwargs.get('headers', {}).get('If-None-Match') == etag:
+                return MockResponse("", 304)
+            return MockResponse(mock_get.feed, headers={'ETag': etag})
         elif 'warning' in url or 'feeds-estonia' in url:
-            return MockResponse(SAMPLE_CAP_XML)
+            time.sleep(mock_get.delay)
+            if isinstance(mock_get.cap, dict):
+                # Documents by the last segment of their link
+                return MockResponse(mock_get.cap[url.rsplit('/', 1)[-1]])
+            return MockResponse(mock_get.cap)
         return MockResponse("", 404)
 
-    monkeypatch.setattr('requests.get', mock_get)
+    mock_get.calls = []
+    mock_get.failures = 0
+    mock_get.closed = 0
+    mock_get.delay = 0
+    mock_get.feed = SAMPLE_ATOM_FEED
+    mock_get.cap = SAMPLE_CAP_XML
+    monkeypatch.setattr('requests.Session.get', mock_get)
     return mock_get
 
 def test_initialization(mock_files, mock_requests):
@@ -183,4 +231,622 @@ def test_warning_string_representation(mock_files, mock_requests):
 def test_case_insensitive_country(mock_files, mock_requests):
     """Test that country names are case insensitive."""
     alarm = MeteoAlarm(['ESTONIA'])
-    assert len(alarm) > 0
\ No newline at end of file
+    assert len(alarm) > 0
+
+def test_parallel_fetch_keeps_order(mock_files, mock_requests):
+    """Test that parallel fetching returns warnings in country order."""
+    alarm = MeteoAlarm(['estonia', 'denmark'], max_workers=4, max_per_host=2)
+    assert [warning.country for warning in alarm] == ['estonia', 'denmark']
+
+def test_invalid_worker_count(mock_files):
+    """Test that a non-positive worker count is rejected."""
+    with pytest.raises(ValueError, match="max_workers must be at least 1"):
+        MeteoAlarm(['estonia'], max_workers=0)
+
+def test_async_fetch(mock_files, mock_requests):
+    """Test fetching warnings with the asyncio client."""
+    threads = []
+    def hook(name, attributes):
+        if name == 'meteoalarm.request':
+            threads.append(threading.current_thread().name)
+    alarm = AsyncMeteoAlarm(['estonia', 'denmark'], hook=hook)
+    assert len(alarm) == 0
+
+    warnings = asyncio.run(alarm.fetch())
+    assert [warning.country for warning in warnings] == ['estonia', 'denmark']
+    assert len(alarm.filter(severity="Moderate")) == 2
+    # Requests run on the threads of the instance, under one limit per instance
+    assert len(threads) == 4 and all(name.startswith('meteoalarm') for name in threads)
+
+    async def limits():
+        return alarm._limit() is alarm._limit()
+    assert asyncio.run(limits())
+    alarm.close()
+
+def test_async_iteration(mock_files, mock_requests):
+    """Test iterating asynchronously over parsed warnings."""
+    async def collect():
+        return [warning async for warning in AsyncMeteoAlarm(['estonia'])]
+
+    warnings = asyncio.run(collect())
+    assert len(warnings) == 1
+    assert isinstance(warnings[0], Alert)
+
+def test_refresh_is_incremental(mock_files, mock_requests):
+    """Test that refresh only downloads what changed and drops removed entries."""
+    alarm = MeteoAlarm(['estonia'])
+    warning = alarm[0]
+
+    mock_requests.calls.clear()
+    assert alarm.refresh() == [warning]
+    assert len(mock_requests.calls) == 1
+
+    # A new feed version with the same entry does not download the CAP document again
+    mock_requests.feed = SAMPLE_ATOM_FEED.replace('rel="self"', 'rel="self" title="updated"')
+    mock_requests.calls.clear()
+    assert alarm.refresh() == [warning]
+    assert len(mock_requests.calls) == 1
+
+    # A feed that fails to parse is not taken as unchanged next time
+    mock_requests.feed = SAMPLE_ATOM_FEED[:100]
+    for _ in range(2):
+        assert alarm.refresh() == [warning]
+        assert alarm.stats.errors == {'feed': 1} and alarm.stats.alerts == 1
+
+    # A changed entry keeps its previous version until the new one parsed, and
+    # documents that failed are retried while the feed is unchanged
+    mock_requests.feed = SAMPLE_ATOM_FEED.replace("10:45:01", "11:45:01")
+    mock_requests.cap = {}
+    assert alarm.refresh() == [warning]
+    mock_requests.cap = SAMPLE_CAP_XML.replace("Moderate", "Severe")
+    mock_requests.calls.clear()
+    assert [warning.severity for warning in alarm.refresh()] == ['Severe']
+    assert len(mock_requests.calls) == 2
+    mock_requests.calls.clear()
+    alarm.refresh()
+    assert len(mock_requests.calls) == 1
+
+    # Documents skipped at the deadline are fetched by the next refresh
+    mock_requests.cap = SAMPLE_CAP_XML
+    mock_requests.delay = 0.2
+    partial = MeteoAlarm(['estonia', 'denmark'], max_workers=1, deadline=0.1)
+    assert [warning.country for warning in partial] == ['estonia']
+    partial.deadline = None
+    assert [warning.country for warning in partial.refresh()] == ['estonia', 'denmark']
+    mock_requests.delay = 0
+
+    mock_requests.feed = SAMPLE_ATOM_FEED.split('<entry>')[0] + '</feed>'
+    assert alarm.refresh() == []
+    assert len(alarm) == 0
+
+def test_lazy_mode_loads_details_on_access(mock_files, mock_requests):
+    """Test that lazy mode builds warnings from the feed and fetches CAP details once."""
+    alarm = MeteoAlarm(['estonia'], lazy=True)
+    assert len(mock_requests.calls) == 1
+
+    warning = alarm[0]
+    assert warning.severity == "Moderate"
+    assert warning.area == {'areaDesc': 'Valga maakond', 'EMMA_ID': 'EE013'}
+    assert warning.expires == datetime(2025, 2, 5, 10, 36, 6, tzinfo=pytz.UTC)
+    assert len(mock_requests.calls) == 1
+
+    assert warning.get_headline("en-EN") == "Strong Wind Warning"
+    assert warning.identifier == "2.49.0.0.233.0.EE2025020412450132"
+    assert warning.awareness_level == "2"
+    assert len(mock_requests.calls) == 2
+
+def test_compiled_geocodes(tmp_path):
+    """Test that compiled geocodes decode the same geometries as the JSON source."""
+    geometry = {"type": "Polygon", "coordinates": [[[26.0, 57.7], [26.5, 57.7], [26.0, 58.0], [26.0, 57.7]]]}
+    source = tmp_path / "geocodes.json"
+    source.write_text(json.dumps({"features": [
+        {"properties": {"type": "EMMA_ID", "code": "EE013"}, "geometry": geometry},
+        {"properties": {"type": "NUTS3", "code": "EE008"}, "geometry": geometry},
+    ]}))
+    target = tmp_path / "geocodes.bin"
+    compile_geocodes(str(source), str(target))
+
+    with open(target, 'rb') as file:
+        store = GeocodeStore.from_compiled(file)
+    assert list(store) == ["EE013"]
+    assert json.loads(store["EE013"]) == geometry
+    assert store["EE013"] is store.get("EE013")
+    assert store.get("EE008") is None
+    assert store.bbox("EE013") == (26.0, 57.7, 26.5, 58.0) and store.bbox("EE008") is None
+
+def test_spatial_queries(mock_files, mock_requests):
+    """Test point and bounding box queries over warning geometries."""
+    alarm = MeteoAlarm(['estonia'])
+    alarm[0].geometry = json.dumps({
+        "type": "Polygon",
+        "coordinates": [[[26.0, 57.5], [27.0, 57.5], [27.0, 58.5], [26.0, 58.5], [26.0, 57.5]]]
+    })
+
+    assert alarm.warnings_at(58.0, 26.5) == [alarm[0]]
+    assert alarm.warnings_at(59.4, 24.7) == []
+    assert alarm.warnings_in_bbox(26.8, 58.3, 28.0, 59.0) == [alarm[0]]
+    assert alarm.warnings_in_bbox(24.0, 59.0, 25.0, 60.0) == []
+
+    # CAP polygons list "lat,lon" points
+    mock_requests.cap = SAMPLE_CAP_XML.replace(
+        "<area>", "<area><polygon>57.5,26.0 57.5,27.0 58.5,27.0 58.5,26.0 57.5,26.0</polygon>")
+    alarm = MeteoAlarm(['estonia'])
+    assert alarm.warnings_at(58.0, 26.5) == [alarm[0]]
+    assert alarm.warnings_at(26.5, 58.0) == []
+    assert alarm.warnings_in_bbox(26.8, 58.3, 28.0, 59.0) == [alarm[0]]
+
+def test_multi_area_geometry(mock_files, mock_requests, monkeypatch):
+    """Test that the geometry of a warning covers all of its areas."""
+    valga = {"type": "Polygon", "coordinates": [[[26.0, 57.5], [27.0, 57.5], [27.0, 58.0], [26.0, 57.5]]]}
+    geocodes = GeocodeStore.from_feature_collection({"features": [
+        {"properties": {"type": "EMMA_ID", "code": "EE013"}, "geometry": valga},
+    ]})
+    monkeypatch.setattr(MeteoAlarm, '_load_geocodes', lambda self: geocodes)
+    mock_requests.cap = SAMPLE_CAP_XML.replace("</area>", """</area>
+        <area>
+            <areaDesc>Harju maakond</areaDesc>
+            <polygon>59.0,24.0 59.0,25.0 59.5,25.0 59.5,24.0 59.0,24.0</polygon>
+        </area>
+        <area>
+            <areaDesc>Saare maakond</areaDesc>
+            <polygon>58.0,22.0 58.0,23.0 58.4,23.0 58.4,22.0 58.0,22.0</polygon>
+        </area>""")
+
+    for alarm in (MeteoAlarm(['estonia']), MeteoAlarm(['estonia'], processes=1)):
+        with alarm:
+            warning = alarm[0]
+            assert [area['areaDesc'] for area in warning.areas] == ['Valga maakond', 'Harju maakond',
+                                                                   'Saare maakond']
+            geometry = json.loads(warning.geometry)
+            assert geometry['type'] == 'MultiPolygon' and len(geometry['coordinates']) == 3
+            assert warning.bbox == (22.0, 57.5, 27.0, 59.5)
+            assert alarm.warnings_at(59.2, 24.5) == [warning]
+            assert alarm.warnings_at(58.2, 22.5) == [warning]
+            assert alarm.warnings_at(57.6, 26.8) == [warning]
+            assert alarm.warnings_at(58.7, 23.5) == []
+
+    # A single geocode area keeps the shared geometry of the geocodes
+    mock_requests.cap = SAMPLE_CAP_XML
+    assert MeteoAlarm(['estonia'])[0].geometry is geocodes['EE013']
+
+def test_chained_filters(mock_files, mock_requests):
+    """Test chaining filters and the membership and range operators."""
+    alarm = MeteoAlarm(['estonia', 'denmark'])
+
+    filtered = alarm.filter(severity="moderate").filter(country="denmark")
+    assert [warning.country for warning in filtered] == ['denmark']
+
+    assert len(alarm.filter(severity__in=["Severe", "Moderate"], EMMA_ID="EE013")) == 2
+    assert len(alarm.filter(severity__in=["Severe"])) == 0
+    assert len(alarm.filter(expires__gt="2025-02-05T00:00:00+00:00")) == 2
+    assert len(alarm.filter(awareness_level__gte="3")) == 0
+    assert len(alarm.filter(description="kirjeldus")) == 2
+
+    with pytest.raises(ValueError, match="Unsupported filter operator"):
+        alarm.filter(severity__like="Moderate")
+    assert len(alarm.filter(positions="x")) == 0
+
+def test_time_queries(mock_files, mock_requests):
+    """Test active_at and overlapping window queries."""
+    alarm = MeteoAlarm(['estonia'])
+
+    assert alarm.active_at("2025-02-04T12:00:00Z") == [alarm[0]]
+    assert alarm.active_at(datetime(2025, 2, 5, 10, 36, 6, tzinfo=pytz.UTC)) == []
+    assert alarm.active_at(datetime(2025, 2, 4, 10, 45, 1)) == [alarm[0]]
+    assert alarm.overlapping("2025-02-05T00:00:00Z", "2025-02-06T00:00:00Z") == [alarm[0]]
+    assert alarm.overlapping("2025-02-03T00:00:00Z", "2025-02-04T10:45:01Z") == []
+
+    # A warning expiring before its onset matches no time
+    mock_requests.cap = SAMPLE_CAP_XML.replace("2025-02-04T10:45:01", "2025-02-06T10:45:01")
+    alarm = MeteoAlarm(['estonia'])
+    assert len(alarm) == 1
+    assert alarm.active_at("2025-02-05T12:00:00Z") == []
+    assert alarm.overlapping("2025-02-01T00:00:00Z", "2025-02-10T00:00:00Z") == []
+
+def test_persistent_cache(mock_files, mock_requests, tmp_path):
+    """Test that a warm start restores warnings from the cache without CAP downloads."""
+    mock_requests.cap = SAMPLE_CAP_XML.replace("2025-02-05T10:36:06", "2099-02-05T10:36:06")
+    path = str(tmp_path / "alerts.db")
+    first = MeteoAlarm(['estonia'], cache=path)
+
+    mock_requests.calls.clear()
+    second = MeteoAlarm(['estonia'], cache=path)
+    assert len(mock_requests.calls) == 1
+    assert second[0] == first[0]
+
+    # Expired warnings and entries beyond the size cap are evicted
+    cache = AlertCache(path, max_entries=1)
+    cache.store('estonia', 'expired', '', {}, datetime(2025, 2, 5, tzinfo=pytz.UTC))
+    cache.store('estonia', 'newer', '', {}, None)
+    cache.evict()
+    assert len(cache) == 1
+    assert cache.load('estonia', [('newer', '')]) == {'newer': {}}
+
+    # Warnings parsed for a language selection are not restored without it
+    mock_requests.calls.clear()
+    assert MeteoAlarm(['estonia'], cache=path, languages=['et'])[0].get_available_languages() == ['et-ET']
+    assert len(mock_requests.calls) == 2
+    assert len(MeteoAlarm(['estonia'], cache=path)[0].get_available_languages()) > 1
+
+    # Entries that fail to load and a failing database are cache misses
+    link, version = second._feed_entries['estonia'][0]
+    cache.store('estonia', link, version, {'identifier': 'broken'}, None)
+    mock_requests.calls.clear()
+    assert len(MeteoAlarm(['estonia'], cache=path)) == 1
+    assert len(mock_requests.calls) == 2
+
+    class LockedCache(AlertCache):
+        writes = 0
+
+        def load(self, country, entries):
+            raise sqlite3.OperationalError("database is locked")
+
+        def store_many(self, entries):
+            LockedCache.writes += 1
+            raise sqlite3.OperationalError("database is locked")
+    assert len(MeteoAlarm(['estonia', 'denmark'], cache=LockedCache(str(tmp_path / "locked.db")))) == 2
+    # Parsed warnings are written once per fetch
+    assert LockedCache.writes == 1
+
+def test_streaming_warnings(mock_files, mock_requests):
+    """Test streaming warnings without fetching on construction."""
+    alarm = MeteoAlarm(['estonia', 'denmark'], stream=True)
+    assert len(mock_requests.calls) == 0
+
+    warnings = list(alarm)
+    assert [warning.country for warning in warnings] == ['estonia', 'denmark']
+    assert len(alarm) == 0
+
+    warnings = list(alarm.iter_warnings(['denmark']))
+    assert [warning.country for warning in warnings] == ['denmark']
+
+    # Countries are checked before iterating, feed responses closed when the consumer stops
+    with pytest.raises(ValueError):
+        alarm.iter_warnings(['atlantis'])
+    mock_requests.closed = 0
+    mock_requests.calls.clear()
+    warnings = alarm.iter_warnings()
+    assert next(warnings).country == 'estonia'
+    warnings.close()
+    feeds = [url for url in mock_requests.calls if 'feeds/meteoalarm-legacy-atom' in url]
+    assert mock_requests.closed == len(feeds) >= 1
+
+    mock_requests.delay = 0.2
+    alarm = MeteoAlarm(['estonia', 'denmark'], stream=True, max_workers=1, deadline=0.1)
+    assert [warning.country for warning in alarm] == ['estonia']
+    assert alarm.stats.errors == {'deadline': 1} and alarm.stats.incomplete == ['denmark']
+
+def test_language_selection(mock_files, mock_requests):
+    """Test that only requested languages are parsed."""
+    alarm = MeteoAlarm(['estonia'], languages=['et'])
+    warning = alarm[0]
+    assert warning.get_available_languages() == ['et-ET']
+    assert warning.get_headline("et-ET") == "Tugeva tuule hoiatus"
+    assert warning.severity == "Moderate"
+    assert warning.sender['senderName'] == "Test Agency"
+
+def test_compact_alert(mock_files, mock_requests):
+    """Test the slotted alert with packed polygon geometry."""
+    mock_requests.cap = SAMPLE_CAP_XML.replace(
+        "<area>", "<area><polygon>58.1,26.1 58.2,26.2 58.0,26.3 58.1,26.1</polygon>")
+    warning = MeteoAlarm(['estonia'])[0]
+
+    assert not hasattr(warning, '__dict__')
+    assert json.loads(warning.geometry) == {
+        "type": "Polygon",
+        "coordinates": [[[26.1, 58.1], [26.2, 58.2], [26.3, 58.0], [26.1, 58.1]]]
+    }
+    assert Alert.from_dict(warning.to_dict()) == warning
+    assert repr(warning).startswith("Alert(identifier=") and f"geometry={warning.geometry!r}" in repr(warning)
+    assert warning.severity is sys.intern("Moderate")
+
+    # The geometry still follows the original fields positionally
+    positional = Alert(*(getattr(warning, name) for name in ALERT_FIELDS[:17]))
+    assert positional.geometry == warning.geometry and positional.msg_type == "Alert"
+
+def test_fetch_stats_and_errors(mock_files, mock_requests, caplog):
+    """Test per-country stats, the instrumentation hook and logged errors."""
+    events = []
+    meteoalarm = MeteoAlarm(['estonia'], hook=lambda name, attributes: events.append((name, attributes)))
+
+    stats = meteoalarm.stats
+    assert stats.alerts == 1 and stats.duration is not None
+    assert [request.kind for request in stats.requests] == ['feed', 'cap']
+    assert stats.countries['estonia'].bytes == len(SAMPLE_ATOM_FEED.encode()) + len(SAMPLE_CAP_XML.encode())
+    assert stats.slowest(1)[0].country == 'estonia'
+    assert [name for name, _ in events] == ['meteoalarm.request', 'meteoalarm.request', 'meteoalarm.fetch']
+
+    mock_requests.cap = "<alert>"
+    with caplog.at_level('ERROR', logger='meteoalarm'):
+        MeteoAlarm(['estonia'], hook=lambda name, attributes: events.append((name, attributes)))
+    assert "Error parsing warning for estonia" in caplog.text
+    assert events[-1][1]['errors'] == {'parse': 1}
+    assert events[-1][1]['countries']['estonia']['alerts'] == 0
+
+def test_process_pool_parsing(mock_files, mock_requests):
+    """Test parsing CAP documents in worker processes."""
+    meteoalarm = MeteoAlarm(['estonia', 'denmark'], processes=2)
+    try:
+        assert meteoalarm() == MeteoAlarm(['estonia', 'denmark'])()
+        assert meteoalarm[0].severity is sys.intern("Moderate")
+        assert meteoalarm.stats.countries['denmark'].alerts == 1
+
+        # A dead worker fails its batches, and the next fetch retries them in a new pool
+        assert meteoalarm._get_parse_pool().submit(os._exit, 1).exception() is not None
+        mock_requests.feed = SAMPLE_ATOM_FEED.replace("10:45:01", "10:55:01")
+        meteoalarm.refresh()
+        assert len(meteoalarm) == 2 and meteoalarm.stats.errors['parse'] == 2
+        meteoalarm.refresh()
+        assert meteoalarm.stats.alerts == 2 and not meteoalarm.stats.errors
+
+        mock_requests.cap = "<alert>"
+        meteoalarm.refresh()
+        assert len(meteoalarm) == 2
+        mock_requests.feed = SAMPLE_ATOM_FEED.replace("10:45:01", "11:45:01")
+        meteoalarm.refresh()
+        assert len(meteoalarm) == 2 and meteoalarm.stats.errors['parse'] == 2
+    finally:
+        meteoalarm.close()
+
+    mock_requests.cap = SAMPLE_CAP_XML
+    with MeteoAlarm(['estonia'], processes=1) as meteoalarm:
+        assert len(meteoalarm) == 1
+    assert meteoalarm._parse_pool is None
+
+    with pytest.raises(ValueError):
+        MeteoAlarm(['estonia'], processes=0)
+
+def test_cap_parser():
+    """Test the standalone CAP parser used by MeteoAlarm and its worker processes."""
+    errors = []
+    parser = CapParser({"et"}, lambda country, error: errors.append(country))
+    warning, codes = parser.parse(SAMPLE_CAP_XML, 'estonia')
+    assert warning.identifier == "2.49.0.0.233.0.EE2025020412450132" and warning.country == 'estonia'
+    assert warning.geometry is None and codes == ("EE013",)
+    assert warning.get_available_languages() == ["et-ET"]
+    assert parser.parse("<alert>", 'denmark') is None and errors == ['denmark']
+
+def test_watcher_events(mock_files, mock_requests):
+    """Test added, updated and expired events of a watcher."""
+    received = []
+    watcher = MeteoAlarm(['estonia', 'denmark']).watch(interval=1e-9, jitter=0, callback=received.append)
+    now = pytz.UTC.localize(datetime(2025, 2, 4, 12))
+
+    events = watcher.poll(now)
+    assert [(event.kind, event.alert.country) for event in events] == [('added', 'estonia'), ('added', 'denmark')]
+    assert received == events
+    assert watcher.poll(now) == []
+
+    mock_requests.cap = SAMPLE_CAP_XML.replace("Moderate", "Severe")
+    mock_requests.feed = SAMPLE_ATOM_FEED.replace("10:45:01", "11:45:01")
+    events = watcher.poll(now)
+    assert [event.kind for event in events] == ['updated', 'updated']
+    assert events[0].alert.severity == 'Severe' and events[0].previous.severity == 'Moderate'
+
+    feed = mock_requests.feed
+    mock_requests.feed = SAMPLE_ATOM_FEED.split("<entry>")[0] + "</feed>"
+    assert [event.kind for event in watcher.poll(now)] == ['expired', 'expired']
+    mock_requests.feed = feed
+    assert [event.kind for event in watcher.poll(now)] == ['added', 'added']
+
+    assert [event.kind for event in watcher.poll(pytz.UTC.localize(datetime(2025, 2, 6)))] == ['expired', 'expired']
+
+    with pytest.raises(ValueError):
+        MeteoAlarm(['estonia']).watch(intervals={'denmark': 60})
+
+    # Watchers of an AsyncMeteoAlarm are polled asynchronously
+    async def watch():
+        watcher = AsyncMeteoAlarm(['estonia']).watch(interval=1e-9, jitter=0)
+        with pytest.raises(TypeError):
+            watcher.poll(now)
+        kinds = [event.kind for event in await watcher.apoll(now)]
+        # At the current time the sample warning has expired
+        async for event in watcher:
+            watcher.stop()
+        return kinds + [event.kind]
+    assert asyncio.run(watch()) == ['added', 'expired']
+
+def test_bulk_export(mock_files, mock_requests, monkeypatch):
+    """Test GeoJSON and columnar exports of all warnings."""
+    mock_requests.cap = SAMPLE_CAP_XML.replace(
+        "<area>", "<area><polygon>58.1,26.1 58.2,26.2 58.0,26.3 58.1,26.1</polygon>")
+    meteoalarm = MeteoAlarm(['estonia', 'denmark'])
+
+    collection = meteoalarm.to_feature_collection(lang='et-ET')
+    assert len(collection['features']) == 2
+    feature = collection['features'][0]
+    assert feature['geometry'] == json.loads(meteoalarm[0].geometry)
+    assert feature['properties']['headline'] == "Tugeva tuule hoiatus"
+    assert feature['properties']['onset'] == "2025-02-04T10:45:01+00:00"
+    json.dumps(collection)
+
+    columns = meteoalarm.to_columns()
+    assert columns['country'] == ['estonia', 'denmark']
+    assert columns['event'] == ["Strong Wind", "Strong Wind"] and columns['language'] == ['en-EN', 'en-EN']
+
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    with pytest.raises(ImportError, match="meteoalarm\\[arrow\\]"):
+        meteoalarm.to_arrow()
+
+
+def test_retries_deadline_and_circuit_breaker(mock_files, mock_requests):
+    """Test retried requests, partial results after the deadline and the circuit breaker."""
+    mock_requests.failures = 2
+    assert len(MeteoAlarm(['estonia'], backoff=0.001)) == 1
+    assert len(mock_requests.calls) == 4
+
+    mock_requests.delay = 0.2
+    meteoalarm = MeteoAlarm(['estonia', 'denmark'], max_workers=1, deadline=0.1)
+    assert [warning.country for warning in meteoalarm] == ['estonia']
+    assert meteoalarm.stats.errors == {'deadline': 1} and meteoalarm.stats.incomplete == ['denmark']
+    mock_requests.delay = 0
+
+    # Requests cut short by the deadline fail with DeadlineExceeded, not as transient errors
+    class SlowSession(requests.Session):
+        def get(self, url, timeout=None, **kwargs):
+            time.sleep(timeout[1])
+            raise requests.ReadTimeout("Read timed out")
+    fetcher = Fetcher(session=SlowSession(), backoff=0.001)
+    with pytest.raises(DeadlineExceeded):
+        fetcher.get("https://example.com", deadline=time.monotonic() + 0.05)
+    fetcher = Fetcher(session=SlowSession(), timeout=0.01, backoff=1)
+    with pytest.raises(DeadlineExceeded):
+        fetcher.get("https://example.com", deadline=time.monotonic() + 0.5)
+    with pytest.raises(requests.ReadTimeout):
+        Fetcher(session=SlowSession(), timeout=0.01, retries=0).get("https://example.com",
+                                                                    deadline=time.monotonic() + 60)
+
+    mock_requests.failures = 100
+    meteoalarm = MeteoAlarm(['estonia'], retries=0, breaker=CircuitBreaker(threshold=2, cooldown=60))
+    meteoalarm.refresh()
+    calls = len(mock_requests.calls)
+    meteoalarm.refresh()
+    assert len(mock_requests.calls) == calls
+    assert meteoalarm.breaker.is_open('estonia') and meteoalarm.stats.errors == {'circuit': 1}
+
+
+def test_updates_and_cancellations(mock_files, mock_requests):
+    """Test that CAP Updates replace the warnings they reference and Cancels remove them."""
+    original = "2.49.0.0.233.0.EE2025020412450132"
+    link = "ede7f627-1b35-4479-8168-1c6f71f0d304"
+    entry = SAMPLE_ATOM_FEED.split("<entry>")[1].split("</entry>")[0]
+    feed = SAMPLE_ATOM_FEED.replace("</entry>", "</entry><entry>" + entry.replace(link, "update") + "</entry>")
+    update = SAMPLE_CAP_XML.replace(original, "2.49.0.0.233.0.EE2025020413450132").replace(
+        "<msgType>Alert</msgType>",
+        f"<msgType>Update</msgType><references>test@example.com,{original},2025-02-04T10:45:01+00:00</references>"
+    ).replace("Moderate", "Severe").replace(
+        "</area>", "</area><area><areaDesc>Tartu maakond</areaDesc></area>", 1)
+    mock_requests.cap = {link: SAMPLE_CAP_XML, "update": update}
+
+    watcher = MeteoAlarm(['estonia']).watch(interval=1e-9, jitter=0)
+    now = pytz.UTC.localize(datetime(2025, 2, 4, 12))
+    assert [event.kind for event in watcher.poll(now)] == ['added']
+
+    mock_requests.feed = feed
+    events = watcher.poll(now)
+    assert [event.kind for event in events] == ['updated']
+    assert events[0].previous.identifier == original and events[0].alert.msg_type == 'Update'
+
+    meteoalarm = watcher.alarm
+    assert len(meteoalarm) == 1 and meteoalarm.get(original) is None
+    warning = meteoalarm.get("2.49.0.0.233.0.EE2025020413450132")
+    assert warning is meteoalarm[0] and warning.severity == 'Severe'
+    assert warning.references == (original,) and warning.sent.hour == 10
+    assert [area['areaDesc'] for area in warning.areas] == ['Valga maakond', 'Tartu maakond']
+    assert warning.areas[0] is warning.area
+    assert Alert.from_dict(warning.to_dict()).references == (original,)
+
+    mock_requests.cap["update"] = update.replace("<msgType>Update</msgType>", "<msgType>Cancel</msgType>")
+    mock_requests.feed = feed.replace("update", "cancel")
+    mock_requests.cap["cancel"] = mock_requests.cap["update"]
+    assert MeteoAlarm(['estonia']).get(original) is None
+    assert len(MeteoAlarm(['estonia'])) == 0
+
+    # Streams never yield Cancel messages, nor warnings cancelled earlier in the stream
+    assert [warning.identifier for warning in MeteoAlarm(['estonia']).iter_warnings()] == [original]
+    reversed_feed = SAMPLE_ATOM_FEED.replace("<entry>", "<entry>" + entry.replace(link, "cancel") + "</entry><entry>")
+    mock_requests.feed = reversed_feed
+    assert list(MeteoAlarm(['estonia']).iter_warnings()) == []
+
+    # Documents arrive in any order with async iteration
+    async def stream():
+        return [warning.msg_type async for warning in AsyncMeteoAlarm(['estonia'])]
+    assert asyncio.run(stream()) in ([], ['Alert'])
+
+    # Warnings without an identifier are kept as they are
+    mock_requests.feed = feed.replace("update", "second")
+    mock_requests.cap = {link: SAMPLE_CAP_XML.replace(original, ""),
+                         "second": SAMPLE_CAP_XML.replace(original, "").replace("Moderate", "Severe")}
+    meteoalarm = MeteoAlarm(['estonia'])
+    assert [warning.severity for warning in meteoalarm] == ['Moderate', 'Severe']
+    assert meteoalarm.get("") is None
+    watcher = meteoalarm.watch(interval=1e-9, jitter=0)
+    assert [event.kind for event in watcher.poll(now)] == ['added', 'added']
+    assert watcher.poll(now) == []
+
+
+def test_bounding_boxes_and_simplified_geometries(mock_files, mock_requests):
+    """Test precomputed bounding boxes and cached simplified geometries of warnings."""
+    points = " ".join(f"{58 + 0.5 * math.sin(i / 50 * math.pi):.6f},{26 + 0.5 * math.cos(i / 50 * math.pi):.6f}"
+                      for i in range(101))
+    mock_requests.cap = SAMPLE_CAP_XML.replace("<area>", f"<area><polygon>{points}</polygon>")
+    alarm = MeteoAlarm(['estonia'])
+    warning = alarm[0]
+    assert warning.bbox == pytest.approx((25.5, 57.5, 26.5, 58.5))
+    feature = alarm.to_feature_collection()["features"][0]
+    assert feature["bbox"] == pytest.approx([25.5, 57.5, 26.5, 58.5])
+
+    simplified = warning.geometry_at(0.01)
+    assert simplified is warning.geometry_at(0.01)
+    ring = json.loads(simplified)["coordinates"][0]
+    assert 4 <= len(ring) < 101 and ring[0] == ring[-1]
+    assert len(json.loads(warning.geometry_at(10))["coordinates"][0]) == 4
+    assert warning.geometry_at(0) == warning.geometry
+    with pytest.raises(ValueError):
+        warning.geometry_at(-1)
+
+    warning.geometry = None
+    assert warning.bbox is None and warning.geometry_at(0.01) is None
+
+
+def test_snapshot_server(mock_files, mock_requests):
+    """Test serving a refreshed snapshot over HTTP and loading it with a client."""
+    server = SnapshotServer(MeteoAlarm(['estonia', 'denmark']), ('127.0.0.1', 0), interval=3600).start()
+    try:
+        client = MeteoAlarm(['estonia'], server=server.url)
+        assert len(client) == 1 and client[0] == server.alarm[0]
+        warning = client[0]
+        mock_requests.calls.clear()
+        assert client.refresh() == [warning] and client[0] is warning
+        assert len(mock_requests.calls) == 1
+
+        response = requests.get(f"{server.url}/warnings?country__in=denmark&severity__in=Moderate,Severe")
+        assert [data['country'] for data in response.json()] == ['denmark']
+        assert requests.get(f"{server.url}/warnings",
+                            headers={'If-None-Match': response.headers['ETag']}).status_code == 200
+        assert requests.get(response.url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+        collection = requests.get(f"{server.url}/warnings.geojson?lang=et-ET").json()
+        assert collection['features'][0]['properties']['headline'] == "Tugeva tuule hoiatus"
+        assert requests.get(f"{server.url}/warnings?expires__lt=soon").status_code == 400
+        status = requests.get(f"{server.url}/status").json()
+        assert status['warnings'] == 2 and status['stats']['alerts'] == 2
+        # A refresh in progress does not show in the status of the snapshot
+        server.alarm._start_stats()
+        assert requests.get(f"{server.url}/status").json()['stats'] == status['stats']
+
+        mock_requests.cap = SAMPLE_CAP_XML.replace("Moderate", "Severe")
+        mock_requests.feed = SAMPLE_ATOM_FEED.replace("10:45:01", "11:45:01")
+        server.refresh()
+        assert client.refresh()[0].severity == 'Severe'
+
+        # Warnings without an identifier are all loaded, even if identical
+        link = "ede7f627-1b35-4479-8168-1c6f71f0d304"
+        entry = SAMPLE_ATOM_FEED.split("<entry>")[1].split("</entry>")[0]
+        mock_requests.feed = SAMPLE_ATOM_FEED.replace("</entry>", "</entry><entry>" + entry.replace(
+            link, "second") + "</entry><entry>" + entry.replace(link, "third") + "</entry>")
+        anonymous = SAMPLE_CAP_XML.replace("2.49.0.0.233.0.EE2025020412450132", "")
+        mock_requests.cap = {link: anonymous, "second": anonymous.replace("Moderate", "Severe"), "third": anonymous}
+        server.refresh()
+        assert [warning.severity for warning in client.refresh()] == ['Moderate', 'Severe', 'Moderate']
+    finally:
+        server.stop()
+
+
+def test_full_text_search(mock_files, mock_requests):
+    """Test keyword, prefix and language-restricted search over warning texts."""
+    mock_requests.cap = SAMPLE_CAP_XML.replace("Test kirjeldus", "TUGEV Tuul, kirjeldus")
+    meteoalarm = MeteoAlarm(['estonia', 'denmark'])
+
+    assert [warning.country for warning in meteoalarm.search("strong wind")] == ['estonia', 'denmark']
+    assert meteoalarm.search("tuul") == list(meteoalarm)
+    assert meteoalarm.search("tuul", lang="en") == []
+    assert meteoalarm.search("tuul", lang=["et-ET"], fields=["description"]) == list(meteoalarm)
+    assert meteoalarm.search("tuul", fields=["headline"]) == []
+    assert meteoalarm.search("TUUL*", fields=["headline"]) == list(meteoalarm)
+    assert meteoalarm.search("wind storm") == [] and meteoalarm.search("  ") == []
+    with pytest.raises(ValueError):
+        meteoalarm.search("wind", fields=["sender"])
+
+    languages = meteoalarm.available_languages()
+    languages.clear()
+    assert meteoalarm.available_languages() == {"en-EN", "et-ET"}